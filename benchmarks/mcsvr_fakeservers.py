@@ -0,0 +1,302 @@
+"""
+Local stand-ins for Minecraft servers, for exercising mcsvr without real servers.
+
+FakeJavaServer answers Server List Ping over TCP (and, with ``query=True``,
+full stat queries over UDP on the same port) and FakeBedrockServer
+answers RakNet unconnected pings over UDP. Each one can be made slow
+(``latency``), silent (``behavior="timeout"``) or unreachable
+(``behavior="refuse"``). FakeServerFarm starts many of them on localhost.
+"""
+import abc
+import asyncio
+import json
+import random
+import socket
+import struct
+from typing import List
+
+BEHAVIORS = ("ok", "timeout", "refuse")
+
+RAKNET_MAGIC = bytes.fromhex("00ffff00fefefefefdfdfdfd12345678")
+
+
+def unused_port(kind: int = socket.SOCK_STREAM) -> int:
+    """Get a localhost port nothing is listening on (for refused connections)."""
+    with socket.socket(socket.AF_INET, kind) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _write_varint(value: int) -> bytes:
+    out = b""
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out += bytes((byte | 0x80,))
+        else:
+            return out + bytes((byte,))
+
+
+async def _read_varint(reader: asyncio.StreamReader) -> int:
+    value = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value
+    raise ValueError("VarInt is too big")
+
+
+def _packet(data: bytes) -> bytes:
+    return _write_varint(len(data)) + data
+
+
+class FakeServer(abc.ABC):
+    def __init__(
+        self,
+        behavior: str = "ok",
+        latency: float = 0.0,
+        max_players: int = 100,
+        motd: str = "§aA §lfake§r server",
+    ):
+        if behavior not in BEHAVIORS:
+            raise ValueError("behavior must be one of {}".format(", ".join(BEHAVIORS)))
+        self.behavior = behavior
+        self.latency = latency
+        self.max_players = max_players
+        self.motd = motd
+        self.online = random.randint(0, max_players)
+        self.port = None
+        self.requests = 0
+
+    @property
+    def address(self) -> str:
+        return "127.0.0.1:{}".format(self.port)
+
+    def next_online(self) -> int:
+        """Random walk the player count, so the tracker sees some servers change."""
+        self.online = min(max(self.online + random.randint(-2, 2), 0), self.max_players)
+        return self.online
+
+    @abc.abstractmethod
+    async def start(self):
+        """Start listening on localhost, setting ``port``."""
+
+    @abc.abstractmethod
+    async def stop(self):
+        """Stop listening."""
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    challenge = 9513307
+
+    def __init__(self, server: "FakeJavaServer"):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        if self.server.behavior != "ok" or data[:2] != b"\xfe\xfd":
+            return
+        kind, session = data[2], data[3:7]
+        if kind == 0x09:
+            reply = b"\x09" + session + str(self.challenge).encode() + b"\x00"
+        elif kind == 0x00 and struct.unpack(">i", data[7:11])[0] == self.challenge:
+            reply = b"\x00" + session + self.server.full_stat()
+        else:
+            return
+        self.transport.sendto(reply, addr)
+
+
+class FakeJavaServer(FakeServer):
+    """Answers the Java edition Server List Ping (status and ping packets)."""
+
+    edition = "java"
+
+    def __init__(self, *args, query: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.query = query
+        self.player_names = ["Player{}".format(i) for i in range(self.max_players)]
+        self._server = None
+        self._query_transport = None
+
+    async def start(self):
+        if self.behavior == "refuse":
+            self.port = unused_port()
+            return
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.query:
+            loop = asyncio.get_event_loop()
+            self._query_transport, _ = await loop.create_datagram_endpoint(
+                lambda: _QueryProtocol(self), local_addr=("127.0.0.1", self.port)
+            )
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._query_transport is not None:
+            self._query_transport.close()
+
+    def full_stat(self) -> bytes:
+        info = {
+            "hostname": self.motd,
+            "gametype": "SMP",
+            "game_id": "MINECRAFT",
+            "version": "1.20.1",
+            "plugins": "",
+            "map": "world",
+            "numplayers": str(self.online),
+            "maxplayers": str(self.max_players),
+            "hostport": str(self.port),
+            "hostip": "127.0.0.1",
+        }
+        data = b"splitnum\x00\x80\x00"
+        for key, value in info.items():
+            data += key.encode() + b"\x00" + value.encode() + b"\x00"
+        data += b"\x00\x01player_\x00\x00"
+        for name in self.player_names[: self.online]:
+            data += name.encode() + b"\x00"
+        return data + b"\x00"
+
+    def status(self) -> dict:
+        return {
+            "version": {"name": "1.20.1", "protocol": 763},
+            "players": {"max": self.max_players, "online": self.next_online()},
+            "description": {"text": self.motd},
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.requests += 1
+        try:
+            if self.behavior == "timeout":
+                # Accept the connection but never answer, like a host that drops packets
+                await reader.read()
+                return
+            while True:
+                length = await _read_varint(reader)
+                data = await reader.readexactly(length)
+                packet_id = data[0]
+                if packet_id == 0x00 and len(data) == 1:  # status request
+                    await asyncio.sleep(self.latency)
+                    body = json.dumps(self.status()).encode()
+                    writer.write(_packet(b"\x00" + _write_varint(len(body)) + body))
+                elif packet_id == 0x01:  # ping, echo its payload back
+                    writer.write(_packet(data))
+                    await writer.drain()
+                    return
+                # Anything else is the handshake, which needs no answer
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+class _BedrockProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server: "FakeBedrockServer"):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        self.server.requests += 1
+        if self.server.behavior != "ok" or not data or data[0] != 0x01:
+            return
+        asyncio.ensure_future(self._reply(data[1:9], addr))
+
+    async def _reply(self, ping_time: bytes, addr):
+        await asyncio.sleep(self.server.latency)
+        name = self.server.pong_data().encode()
+        pong = (
+            b"\x1c"
+            + ping_time
+            + struct.pack(">q", 0x1234567812345678)
+            + RAKNET_MAGIC
+            + struct.pack(">H", len(name))
+            + name
+        )
+        self.transport.sendto(pong, addr)
+
+
+class FakeBedrockServer(FakeServer):
+    """Answers RakNet unconnected pings the way a Bedrock edition server does."""
+
+    edition = "bedrock"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._transport = None
+
+    async def start(self):
+        if self.behavior == "refuse":
+            self.port = unused_port(socket.SOCK_DGRAM)
+            return
+        loop = asyncio.get_event_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _BedrockProtocol(self), local_addr=("127.0.0.1", 0)
+        )
+        self.port = self._transport.get_extra_info("sockname")[1]
+
+    async def stop(self):
+        if self._transport is not None:
+            self._transport.close()
+
+    def pong_data(self) -> str:
+        return "MCPE;{};594;1.20.1;{};{};1234567812345678;Fake world;Survival;1;{};{};".format(
+            self.motd, self.next_online(), self.max_players, self.port, self.port
+        )
+
+
+class FakeServerFarm:
+    """
+    Runs many fake servers at once.
+
+    ``timeout_ratio`` and ``refuse_ratio`` are the fractions of servers
+    that never answer or refuse connections, and ``bedrock_ratio`` is the
+    fraction that are Bedrock servers. ``latency`` is the base response
+    delay, each server adding up to the same again at random.
+    """
+
+    def __init__(
+        self,
+        count: int,
+        latency: float = 0.05,
+        timeout_ratio: float = 0.0,
+        refuse_ratio: float = 0.0,
+        bedrock_ratio: float = 0.0,
+        seed: int = None,
+    ):
+        rand = random.Random(seed)
+        self.servers: List[FakeServer] = []
+        for _ in range(count):
+            roll = rand.random()
+            if roll < timeout_ratio:
+                behavior = "timeout"
+            elif roll < timeout_ratio + refuse_ratio:
+                behavior = "refuse"
+            else:
+                behavior = "ok"
+            server_cls = FakeBedrockServer if rand.random() < bedrock_ratio else FakeJavaServer
+            self.servers.append(server_cls(behavior, latency * (1 + rand.random())))
+
+    async def __aenter__(self) -> "FakeServerFarm":
+        await asyncio.gather(*(server.start() for server in self.servers))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.gather(*(server.stop() for server in self.servers))
+
+    @property
+    def addresses(self) -> List[str]:
+        return [server.address for server in self.servers]
+
+    @property
+    def requests(self) -> int:
+        return sum(server.requests for server in self.servers)
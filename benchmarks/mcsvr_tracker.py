@@ -0,0 +1,189 @@
+"""
+Benchmark the mcsvr tracker against local fake servers.
+
+Starts a farm of fake Java/Bedrock servers (see mcsvr_fakeservers), has
+simulated channels track them, and runs full tracker sweeps through
+Mcsvr.check_due_servers, reporting the duration of each sweep, probes per
+second, Discord edits made and peak memory. Discord itself is replaced
+by in-memory channels; everything from the status checks down is real.
+
+Requires Red and the cog's requirements to be installed. Run from the
+repository root, e.g.:
+
+    python benchmarks/mcsvr_tracker.py --servers 1000 --channels 1000 --timeout-ratio 0.05
+"""
+import argparse
+import asyncio
+import itertools
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from redbot.core import data_manager  # noqa: E402
+
+from mcsvr_fakeservers import FakeServerFarm  # noqa: E402
+
+_ids = itertools.count(1000)
+
+
+class FakePermissions:
+    manage_channels = True
+
+
+class FakeGuild:
+    def __init__(self):
+        self.id = next(_ids)
+        self.me = object()
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeChannel", message_id: int = None):
+        self.channel = channel
+        self.id = message_id or next(_ids)
+
+    async def edit(self, **kwargs):
+        await self.channel.api_call()
+
+    async def delete(self):
+        await self.channel.api_call()
+
+
+class FakeChannel:
+    """Stands in for a discord.TextChannel, counting the API calls made on it."""
+
+    api_latency = 0.0
+    api_calls = 0
+
+    def __init__(self, guild: FakeGuild):
+        self.id = next(_ids)
+        self.guild = guild
+        self.topic = ""
+
+    async def api_call(self):
+        FakeChannel.api_calls += 1
+        await asyncio.sleep(self.api_latency)
+
+    def permissions_for(self, member):
+        return FakePermissions()
+
+    async def edit(self, topic: str = None, **kwargs):
+        await self.api_call()
+        self.topic = topic
+
+    async def send(self, **kwargs) -> FakeMessage:
+        await self.api_call()
+        return FakeMessage(self)
+
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        return FakeMessage(self, message_id)
+
+
+class FakeBot:
+    def __init__(self):
+        self.loop = asyncio.get_event_loop()
+        self.channels = {}
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+    def get_cog(self, name: str):
+        # The cog is driven by hand, so its own loop should stop right away
+        return None
+
+
+def use_temporary_data_path(path: str):
+    """Point Red's Config at a scratch directory, like Red's own test fixtures do."""
+    data_manager.basic_config = dict(
+        data_manager.basic_config_default, DATA_PATH=path, STORAGE_TYPE="JSON"
+    )
+
+
+async def run(args):
+    from mcsvr.mcsvr import Mcsvr
+
+    FakeChannel.api_latency = args.api_latency
+    bot = FakeBot()
+    cog = Mcsvr(bot)
+    await cog.svr_chk_task  # loads the (empty) tracker index, then exits
+
+    async with FakeServerFarm(
+        args.servers,
+        latency=args.latency,
+        timeout_ratio=args.timeout_ratio,
+        refuse_ratio=args.refuse_ratio,
+        bedrock_ratio=args.bedrock_ratio,
+        seed=args.seed,
+    ) as farm:
+        guild = FakeGuild()
+        cog._tracker.set_mode(guild.id, args.mode)
+        addresses = itertools.cycle(farm.addresses)
+        for _ in range(args.channels):
+            channel = FakeChannel(guild)
+            bot.channels[channel.id] = channel
+            if args.mode == "text":
+                cog._tracker.add(channel.id, None, next(addresses))
+            elif args.mode == "embed":
+                for _ in range(args.per_channel):
+                    cog._tracker.add(channel.id, next(_ids), next(addresses))
+            else:
+                for _ in range(args.per_channel):
+                    cog._tracker.add_to_dashboard(channel.id, next(addresses))
+
+        print(
+            "{} servers, {} channels in {} mode, {} tracked displays".format(
+                args.servers, args.channels, args.mode, len(cog._tracker)
+            )
+        )
+        tracemalloc.start()
+        for tick in range(1, args.ticks + 1):
+            tracked = cog.get_tracked_servers()
+            cog._scheduler.sync(tracked.keys(), time.monotonic())
+            due = cog._scheduler.pop_due(float("inf"))  # a full sweep, the worst case
+            calls_before = FakeChannel.api_calls
+            started = time.perf_counter()
+            await cog.check_due_servers(due, tracked)
+            duration = time.perf_counter() - started
+            failed = sum(1 for key in due if isinstance(cog._latest.get(key), (str, Exception)))
+            print(
+                "tick {}: {} probes in {:.2f}s ({:.0f}/s), {} online, {} Discord calls".format(
+                    tick,
+                    len(due),
+                    duration,
+                    len(due) / duration,
+                    len(due) - failed,
+                    FakeChannel.api_calls - calls_before,
+                )
+            )
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print("peak memory during sweeps: {:.1f} MiB".format(peak / 2 ** 20))
+        print("requests received by fake servers: {}".format(farm.requests))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--servers", type=int, default=1000)
+    parser.add_argument("--channels", type=int, default=1000)
+    parser.add_argument("--mode", choices=("text", "embed", "dashboard"), default="text")
+    parser.add_argument(
+        "--per-channel", type=int, default=1, help="servers per channel (embed/dashboard)"
+    )
+    parser.add_argument("--ticks", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="base server latency (s)")
+    parser.add_argument("--timeout-ratio", type=float, default=0.0)
+    parser.add_argument("--refuse-ratio", type=float, default=0.0)
+    parser.add_argument("--bedrock-ratio", type=float, default=0.0)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="simulated Discord latency")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as data_path:
+        use_temporary_data_path(data_path)
+        asyncio.get_event_loop().run_until_complete(run(args))
+
+
+if __name__ == "__main__":
+    main()
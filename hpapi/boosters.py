@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from aiopixel.gametypes import GameType
+from aiopixel.models.boosters import Booster
+
+from .client import HypixelClient
+from .names import NameCache
+
+log = logging.getLogger("palmtree5.cogs.hpapi")
+
+# Maximum number of purchaser names looked up at once
+NAME_CONCURRENCY = 8
+
+
+class BoosterSnapshot:
+    """The active boosters at one point in time, with the active one for each game."""
+
+    __slots__ = ("fetched_at", "active", "by_game")
+
+    def __init__(self, boosters: List[Booster], fetched_at: float):
+        self.fetched_at = fetched_at
+        # Boosters still at their original length are queued, not running
+        self.active = [b for b in boosters if b.length != b.original_length]
+        self.by_game: Dict[GameType, Booster] = {}
+        for booster in self.active:
+            if booster.length < booster.original_length:
+                self.by_game.setdefault(booster.game_type, booster)
+
+    def for_game(self, game_type: Optional[GameType]) -> Optional[Booster]:
+        return self.by_game.get(game_type)
+
+
+class BoosterBoard:
+    """
+    A booster snapshot shared by every command, refreshed at most once per ``ttl``.
+
+    A snapshot older than ``ttl`` is still returned while a newer one is
+    fetched in the background, unless it's older than ``max_age``, in which
+    case the caller waits for the new one. Only one fetch is ever in
+    progress. Each new snapshot's purchaser names are looked up into the
+    name cache right away, a few at a time.
+    """
+
+    def __init__(self, ttl: float = 60, max_age: float = 300):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.snapshot: Optional[BoosterSnapshot] = None
+        self._refresh_task = None
+        self.fetches = 0
+
+    async def get(self, client: HypixelClient, names: NameCache) -> BoosterSnapshot:
+        snapshot = self.snapshot
+        age = None if snapshot is None else time.monotonic() - snapshot.fetched_at
+        if age is not None and age < self.ttl:
+            return snapshot
+        task = self._refresh(client, names)
+        if age is None or age >= self.max_age:
+            return await asyncio.shield(task)
+        return snapshot
+
+    def _refresh(self, client: HypixelClient, names: NameCache) -> asyncio.Future:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._fetch(client, names))
+            self._refresh_task.add_done_callback(self._log_failure)
+        return self._refresh_task
+
+    @staticmethod
+    def _log_failure(task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Failed refreshing the boosters", exc_info=task.exception())
+
+    async def _fetch(self, client: HypixelClient, names: NameCache) -> BoosterSnapshot:
+        boosters = await client.boosters()
+        self.fetches += 1
+        self.snapshot = BoosterSnapshot(boosters, time.monotonic())
+        asyncio.ensure_future(self._resolve_names(self.snapshot, names))
+        return self.snapshot
+
+    @staticmethod
+    async def _resolve_names(snapshot: BoosterSnapshot, names: NameCache):
+        sem = asyncio.Semaphore(NAME_CONCURRENCY)
+
+        async def resolve(uuid: str):
+            async with sem:
+                try:
+                    await names.name_for(uuid)
+                except Exception:
+                    log.debug("Failed looking up the name for {}".format(uuid), exc_info=True)
+
+        purchasers = {booster.purchaser_uuid for booster in snapshot.active}
+        await asyncio.gather(*(resolve(uuid) for uuid in purchasers))
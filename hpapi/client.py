@@ -0,0 +1,138 @@
+import asyncio
+from functools import partial
+from typing import Awaitable, Callable, Dict, Hashable, List
+
+import aiohttp
+from aiopixel import PixelClient
+from aiopixel.exceptions import (
+    GuildNotFound,
+    InvalidKeyException,
+    NoStatusForPlayer,
+    PixelException,
+    PlayerNotFound,
+    PlayerNotInGuild,
+)
+from aiopixel.models.boosters import Booster
+from aiopixel.models.friends import Friend
+from aiopixel.models.guilds import Guild
+from aiopixel.models.players import Player
+from aiopixel.models.sessions import PlayerStatus
+from aiopixel.utils import clean_uuid
+
+from .cache import ResponseCache
+from .ratelimit import BACKGROUND, INTERACTIVE, RateLimiter
+
+# Errors that are answers ("no such guild") rather than failures, so they're cached too
+NOT_FOUND_ERRORS = (GuildNotFound, NoStatusForPlayer, PlayerNotFound, PlayerNotInGuild)
+
+
+def fails_every_request(error: Exception) -> bool:
+    """
+    Get whether an error means requests in general are failing, not just the one that raised it.
+
+    That's the key being invalid, the network or API being down, or an
+    error status like 429 or 5xx, which aiopixel raises as a bare
+    PixelException.
+    """
+    if isinstance(error, (InvalidKeyException, aiohttp.ClientError, asyncio.TimeoutError)):
+        return True
+    return type(error) is PixelException
+
+
+def default_caches() -> Dict[str, ResponseCache]:
+    """Get a cache for each cached endpoint, with TTLs to suit how often its data changes."""
+    return {
+        "guild": ResponseCache(maxsize=512, ttl=300, negative_ttl=300),
+        "player": ResponseCache(maxsize=1024, ttl=120, negative_ttl=300),
+        "status": ResponseCache(maxsize=1024, ttl=30, negative_ttl=30),
+        "find_guild": ResponseCache(maxsize=4096, ttl=600, negative_ttl=120),
+    }
+
+
+class HypixelClient:
+    """
+    The PixelClient calls the cog makes, each waiting its turn with the rate limiter.
+
+    Requests go in the interactive lane; ``background`` is the same client
+    with its requests in the background lane instead.
+
+    Guilds, players, statuses and guild lookups are cached per guild ID
+    or UUID, and overlapping requests for the same one share a single
+    request, except that interactive requests never wait on a
+    background one. Background requests always go to the API, since
+    they're made to refresh what's known, but the cache is updated with
+    the results.
+    """
+
+    def __init__(
+        self,
+        client: PixelClient,
+        limiter: RateLimiter,
+        lane: int = INTERACTIVE,
+        caches: Dict[str, ResponseCache] = None,
+        inflight: dict = None,
+    ):
+        self.client = client
+        self.limiter = limiter
+        self.lane = lane
+        self.caches = default_caches() if caches is None else caches
+        self._inflight = {} if inflight is None else inflight  # shared by both lanes
+
+    @property
+    def background(self) -> "HypixelClient":
+        return HypixelClient(self.client, self.limiter, BACKGROUND, self.caches, self._inflight)
+
+    @property
+    def session(self):
+        return self.client._session
+
+    async def _request(self, call: Callable[[], Awaitable]):
+        await self.limiter.acquire(self.lane)
+        return await call()
+
+    async def _cached(self, endpoint: str, key: Hashable, call: Callable[[], Awaitable]):
+        cache = self.caches[endpoint]
+        if self.lane != BACKGROUND:
+            entry = cache.get(key)
+            if entry is not None:
+                value, failed = entry
+                if failed:
+                    raise value
+                return value
+        flight_key = (endpoint, key, self.lane)
+        task = self._inflight.get(flight_key)
+        if task is None and self.lane == BACKGROUND:
+            # Background requests can share an interactive one, but not the other way around,
+            # since that would leave a command waiting its turn in the background lane
+            task = self._inflight.get((endpoint, key, INTERACTIVE))
+        if task is None:
+            task = asyncio.ensure_future(self._request(call))
+            self._inflight[flight_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(flight_key, None))
+        try:
+            value = await asyncio.shield(task)
+        except NOT_FOUND_ERRORS as e:
+            cache.set(key, (e, True), failed=True)
+            raise
+        cache.set(key, (value, False))
+        return value
+
+    async def boosters(self) -> List[Booster]:
+        return await self._request(self.client.boosters)
+
+    async def find_guild_by_uuid(self, uuid: str) -> str:
+        call = partial(self.client.find_guild_by_uuid, uuid)
+        return await self._cached("find_guild", clean_uuid(uuid), call)
+
+    async def friends(self, uuid: str) -> List[Friend]:
+        return await self._request(partial(self.client.friends, uuid))
+
+    async def guild(self, guild_id: str) -> Guild:
+        return await self._cached("guild", guild_id, partial(self.client.guild, guild_id))
+
+    async def player_from_uuid(self, uuid: str) -> Player:
+        call = partial(self.client.player_from_uuid, uuid)
+        return await self._cached("player", clean_uuid(uuid), call)
+
+    async def status(self, uuid: str) -> PlayerStatus:
+        return await self._cached("status", clean_uuid(uuid), partial(self.client.status, uuid))
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+log = logging.getLogger("palmtree5.cogs.hpapi")
+
+
+class GuildIndex:
+    """
+    The members of every known guild, and which known guild each player is in.
+
+    Both directions are kept in memory, so finding a player's guild is a
+    dict lookup. On disk the index is a journal of JSON lines, one per
+    guild update, so recording a guild appends a line instead of
+    rewriting everything. The journal is compacted down to one line per
+    guild once it has grown to several times that.
+
+    When each guild was last refreshed from the API is kept too (0 for
+    never), so refreshing can pick up where it left off after a restart.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.members: Dict[str, Set[str]] = {}  # guild id -> member uuids
+        self.by_member: Dict[str, str] = {}  # player uuid -> guild id
+        self.refreshed_at: Dict[str, float] = {}  # guild id -> unix time of the last refresh
+        self._journal_lines = 0
+        self._compacting = False
+        self._held = []  # entries recorded while compacting, appended once it's done
+
+    def __len__(self):
+        return len(self.members)
+
+    def __contains__(self, guild_id: str) -> bool:
+        return guild_id in self.members
+
+    @classmethod
+    def load(cls, path: Path) -> "GuildIndex":
+        index = cls(path)
+        if not path.exists():
+            return index
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Most likely a line cut short by a crash while appending
+                    log.warning("Skipping a corrupt line in {}".format(path))
+                    continue
+                if "members" in entry:
+                    index._apply(entry["id"], entry["members"])
+                if entry["id"] in index.members:
+                    index.refreshed_at[entry["id"]] = entry.get("refreshed_at", 0.0)
+                else:
+                    index.refreshed_at.pop(entry["id"], None)
+                index._journal_lines += 1
+        return index
+
+    def guild_for(self, uuid: str) -> Optional[str]:
+        """Get the ID of the known guild the player is in, if any."""
+        return self.by_member.get(uuid)
+
+    def set_members(
+        self, guild_id: str, uuids: Iterable[str], refreshed_at: float = 0.0
+    ) -> Tuple[Set[str], Set[str]]:
+        """
+        Record a guild's current members, adding the guild if it isn't known yet.
+
+        ``refreshed_at`` is when the members were fetched from the API.
+        Returns the UUIDs of the players who joined and who left since the
+        members were last recorded (for a new guild, everyone joined).
+        """
+        uuids = set(uuids)
+        changes = self._apply(guild_id, uuids)
+        self.refreshed_at[guild_id] = refreshed_at
+        self._append({"id": guild_id, "members": sorted(uuids), "refreshed_at": refreshed_at})
+        return changes
+
+    def mark_refreshed(self, guild_id: str, refreshed_at: float):
+        """Record that a guild was refreshed without its members changing."""
+        if guild_id in self.members:
+            self.refreshed_at[guild_id] = refreshed_at
+            self._append({"id": guild_id, "refreshed_at": refreshed_at})
+
+    def remove(self, guild_id: str):
+        if guild_id in self.members:
+            self._apply(guild_id, None)
+            del self.refreshed_at[guild_id]
+            self._append({"id": guild_id, "members": None})
+
+    def stalest(self) -> Optional[Tuple[str, float]]:
+        """Get the guild refreshed longest ago and when that was, or ``None`` if there are none."""
+        if not self.refreshed_at:
+            return None
+        guild_id = min(self.refreshed_at, key=self.refreshed_at.__getitem__)
+        return guild_id, self.refreshed_at[guild_id]
+
+    def _apply(
+        self, guild_id: str, uuids: Optional[Iterable[str]]
+    ) -> Tuple[Set[str], Set[str]]:
+        old = self.members.pop(guild_id, set())
+        new = set(uuids) if uuids is not None else set()
+        joined, left = new - old, old - new
+        for uuid in left:
+            # A player listed by two guilds has moved and one of them is out of date; the
+            # player is dropped rather than searched for, and found through the API instead
+            if self.by_member.get(uuid) == guild_id:
+                del self.by_member[uuid]
+        for uuid in new:
+            self.by_member[uuid] = guild_id
+        if uuids is not None:
+            self.members[guild_id] = new
+        return joined, left
+
+    def _append(self, entry: dict):
+        self._journal_lines += 1
+        if self._compacting:
+            self._held.append(entry)
+            return
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def needs_compaction(self) -> bool:
+        return self._journal_lines > 2 * len(self.members) + 16
+
+    def _write_compacted(self, snapshot: List[dict]):
+        tmp_path = self.path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            for entry in snapshot:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+
+    async def compact(self):
+        """Rewrite the journal with only the latest entry for each guild."""
+        if self._compacting:
+            return
+        snapshot = [
+            {"id": guild_id, "members": sorted(uuids), "refreshed_at": self.refreshed_at[guild_id]}
+            for guild_id, uuids in self.members.items()
+        ]
+        self._compacting = True
+        try:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._write_compacted, snapshot)
+            self._journal_lines = len(snapshot)
+        finally:
+            self._compacting = False
+            held, self._held = self._held, []
+            for entry in held:
+                self._append(entry)
@@ -1,5 +1,7 @@
 from datetime import datetime
 from urllib.parse import quote
+import hashlib
+import json
 import math
 import datetime
 from aiopixel.models.boosters import Booster
@@ -8,10 +10,18 @@ from aiopixel.models.friends import Friend
 from aiopixel.models.guilds import Guild
 import discord
 
+from .names import NameCache
 
-async def get_booster_embed(booster: Booster) -> discord.Embed:
+
+def embed_fingerprint(embed: discord.Embed) -> str:
+    """Get a stable hash of an embed's content, for telling whether it has changed."""
+    data = json.dumps(embed.to_dict(), sort_keys=True, default=str)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+async def get_booster_embed(booster: Booster, names: NameCache) -> discord.Embed:
     game_name = booster.game_type.clean_name
-    purchaser = await booster.purchaser_name()
+    purchaser = await names.name_for(booster.purchaser_uuid)
     desc = "Activated at {}".format(booster.activated_at.strftime("%Y-%m-%d %H:%M:%S"))
     thumb_url = "http://minotar.net/avatar/{}/128.png".format(purchaser)
     remaining = str(datetime.timedelta(seconds=booster.length))
@@ -54,16 +64,16 @@ async def get_player_embed(player: Player) -> discord.Embed:
     return em
 
 
-async def get_friend_embed(friend: Friend) -> discord.Embed:
-    sender = await friend.sender_name()
-    receiver = await friend.receiver_name()
+async def get_friend_embed(friend: Friend, names: NameCache) -> discord.Embed:
+    sender = await names.name_for(friend.sender_uuid)
+    receiver = await names.name_for(friend.receiver_uuid)
     em = discord.Embed(title=f"Friendship between {sender} and {receiver}")
     em.add_field(name="Created at", value=friend.started.strftime("%Y-%m-%d %H:%M:%S"))
     return em
 
 
-async def get_guild_embed(guild: Guild) -> discord.Embed:
-    gmaster = [await m.name() for m in guild.members if m.rank == "GUILDMASTER"][0]
+async def get_guild_embed(guild: Guild, names: NameCache) -> discord.Embed:
+    gmaster = [await names.name_for(m.uuid) for m in guild.members if m.rank == "GUILDMASTER"][0]
     gmaster_face = "http://minotar.net/avatar/{}/128.png".format(gmaster)
     em = discord.Embed(
         title=guild.name,
@@ -1,22 +1,42 @@
 """Extension for Red-DiscordBot"""
 import asyncio
 import logging
+import time
 from datetime import timedelta
-from typing import Any, Dict, Literal
+from typing import Any, Dict, Literal, Optional, Set, Tuple
 
+import aiohttp
 import discord
 from aiopixel import PixelClient
-from aiopixel.exceptions import GuildNotFound, PlayerNotInGuild, PlayerNotFound, NoStatusForPlayer
+from aiopixel.exceptions import (
+    GuildNotFound,
+    NoStatusForPlayer,
+    PlayerNotFound,
+    PlayerNotInGuild,
+)
 from aiopixel.gametypes import GameType
-from aiopixel.utils import get_player_uuid
+from aiopixel.models.boosters import Booster
+from aiopixel.models.guilds import Guild
 from redbot.core import commands
 from redbot.core import Config, commands, checks, data_manager
 from redbot.core.bot import Red
 from redbot.core.i18n import Translator
+from redbot.core.utils.chat_formatting import humanize_list, humanize_timedelta
 from redbot.core.utils.embed import randomize_colour
-from redbot.core.utils.menus import DEFAULT_CONTROLS, menu
 
-from .helpers import get_booster_embed, get_friend_embed, get_guild_embed, get_player_embed
+from .boosters import BoosterBoard
+from .client import HypixelClient, fails_every_request
+from .guildindex import GuildIndex
+from .helpers import (
+    embed_fingerprint,
+    get_booster_embed,
+    get_friend_embed,
+    get_guild_embed,
+    get_player_embed,
+)
+from .names import NameCache
+from .pages import LazyPages
+from .ratelimit import RateLimiter
 
 
 RequesterTypes = Literal["discord_deleted_user", "owner", "user", "user_strict"]
@@ -25,13 +45,28 @@ _ = Translator("Hpapi", __file__)
 
 log = logging.getLogger("palmtree5.cogs.hpapi")
 
+# Each known guild is refreshed about this often
+REFRESH_INTERVAL = timedelta(weeks=1).total_seconds()
+# Longest the refresher sleeps before checking for newly known guilds
+MAX_REFRESH_SLEEP = 300
+# Seconds before retrying a failed refresh, doubled for each failure in a row
+REFRESH_RETRY = 15
+# Longest a guild that keeps failing to refresh waits before it's tried again
+MAX_GUILD_RETRY = timedelta(days=1).total_seconds()
+# Seconds between updates of the tracked guild embeds
+TRACK_INTERVAL = 300
+# Maximum number of tracked guilds fetched (or messages edited) at once
+TRACK_CONCURRENCY = 4
+# Most names listed for each of joined and left in a change log message
+CHANGELOG_MAX_NAMES = 20
+
 
 class Hpapi(commands.Cog):
     """Cog for getting info from Hypixel's API"""
 
     default_global = {"api_key": "", "known_guilds": []}
 
-    default_channel = {"guild_id": "", "message": 0}
+    default_channel = {"guild_id": "", "message": 0, "fingerprint": "", "changelog": False}
 
     def __init__(self, bot: Red):
         self.bot = bot
@@ -40,11 +75,22 @@ class Hpapi(commands.Cog):
         self.settings.register_channel(**self.default_channel)
         loop = asyncio.get_event_loop()
         self.api_client = None
+        self.ratelimit = RateLimiter()
+        self.boosters = BoosterBoard()
+        self.guild_index = None
+        self._index_ready = asyncio.Event()
+        self._changelogs: Dict[str, Set[int]] = {}  # guild id -> ids of channels logging it
+        # guild id -> (failed refreshes in a row, unix time to retry at)
+        self._refresh_failures: Dict[str, Tuple[int, float]] = {}
+        self.names = NameCache(data_manager.cog_data_path(self) / "names.json")
         self.guild_update_task = loop.create_task(self.update_guilds())
+        self.tracker_task = loop.create_task(self.update_tracked())
         loop.create_task(self.check_api_key())
 
     def cog_unload(self):
         self.guild_update_task.cancel()
+        self.tracker_task.cancel()
+        self.names.save_now()
 
     async def __error(self, ctx: commands.Context, error):
         await ctx.send("`Error in {0.command.qualified_name}: {1}`".format(ctx, error))
@@ -67,46 +113,266 @@ class Hpapi(commands.Cog):
             base_cmd.enabled = False
             guild_track_cmd.enabled = False
         else:
-            self.api_client = PixelClient(api_key)
+            if self.api_client is not None:
+                await self.api_client.session.close()
+            client = PixelClient(api_key)
+            # Use a session that tells the rate limiter what Hypixel says about the limit
+            await client._session.close()
+            client._session = aiohttp.ClientSession(
+                trace_configs=[self.ratelimit.trace_config()]
+            )
+            self.api_client = HypixelClient(client, self.ratelimit)
+            self.names.session = self.api_client.session
             base_cmd.enabled = True
             guild_track_cmd.enabled = True
 
+    async def load_guild_index(self):
+        """
+        Load the index of known guild members from the cog's data path.
+
+        Known guilds used to be stored in Config as one big list, so any
+        found there are moved into the index.
+        """
+        path = data_manager.cog_data_path(self) / "guild_index.jsonl"
+        loop = asyncio.get_event_loop()
+        self.guild_index = await loop.run_in_executor(None, GuildIndex.load, path)
+        for channel_id, data in (await self.settings.all_channels()).items():
+            if data["changelog"] and data["guild_id"]:
+                self._changelogs.setdefault(data["guild_id"], set()).add(channel_id)
+        known_guilds = await self.settings.known_guilds()
+        if known_guilds:
+            for g in known_guilds:
+                self.guild_index.set_members(g["id"], g["members"])
+            await self.settings.known_guilds.clear()
+            log.info("Moved {} known guilds into the guild index".format(len(known_guilds)))
+        self._index_ready.set()
+
+    async def find_guild_id(self, uuid: str) -> str:
+        """
+        Get the ID of the guild the player is in.
+
+        Known guilds are checked first, and the API only if the player
+        isn't in one of them. Raises PlayerNotInGuild if the player isn't
+        in a guild.
+        """
+        await self._index_ready.wait()
+        guild_id = self.guild_index.guild_for(uuid)
+        if guild_id is None:
+            guild_id = await self.api_client.find_guild_by_uuid(uuid)
+        return guild_id
+
+    async def get_player_guild(self, uuid: str) -> Tuple[str, Guild]:
+        """
+        Get the ID of the guild the player is in, and the guild.
+
+        If the player's known guild turns out to have been deleted, it's
+        forgotten and the player's guild is looked up again. Raises
+        PlayerNotInGuild if the player isn't in a guild.
+        """
+        guild_id = await self.find_guild_id(uuid)
+        try:
+            return guild_id, await self.api_client.guild(guild_id)
+        except GuildNotFound:
+            if guild_id not in self.guild_index:
+                raise
+        self.guild_index.remove(guild_id)
+        guild_id = await self.api_client.find_guild_by_uuid(uuid)
+        return guild_id, await self.api_client.guild(guild_id)
+
+    async def remember_guild(self, guild_id: str, guild):
+        """Record the guild's members in the index, as just refreshed.
+
+        If the guild was already known and its members changed, the
+        change is announced (see membership_changed)."""
+        await self._index_ready.wait()
+        uuids = {x.uuid for x in guild.members}
+        known = guild_id in self.guild_index
+        if self.guild_index.members.get(guild_id) != uuids:
+            joined, left = self.guild_index.set_members(guild_id, uuids, time.time())
+            if known:
+                await self.membership_changed(guild_id, guild, joined, left)
+        else:
+            self.guild_index.mark_refreshed(guild_id, time.time())
+        if self.guild_index.needs_compaction():
+            await self.guild_index.compact()
+
+    async def membership_changed(self, guild_id: str, guild, joined: Set[str], left: Set[str]):
+        """Announce players joining and leaving a guild.
+
+        This dispatches a ``hypixel_guild_membership_change`` event with
+        the guild ID and the UUIDs that joined and left, and posts a short
+        change log in each channel tracking the guild that asked for one."""
+        self.bot.dispatch("hypixel_guild_membership_change", guild_id, joined, left)
+        channels = [
+            channel
+            for channel in map(self.bot.get_channel, self._changelogs.get(guild_id, ()))
+            if channel is not None
+        ]
+        if not channels:
+            return
+        msg = _("Member changes in {}:").format(guild.name)
+        for label, uuids in ((_("Joined"), joined), (_("Left"), left)):
+            if not uuids:
+                continue
+            shown = sorted(uuids)[:CHANGELOG_MAX_NAMES]
+            names = await asyncio.gather(
+                *(self.names.name_for(uuid) for uuid in shown), return_exceptions=True
+            )
+            names = [n if isinstance(n, str) else uuid for n, uuid in zip(names, shown)]
+            if len(uuids) > len(shown):
+                names.append(_("{} more").format(len(uuids) - len(shown)))
+            msg += "\n{}: {}".format(label, humanize_list(names))
+        for channel in channels:
+            try:
+                await channel.send(msg)
+            except discord.HTTPException:
+                log.exception("Failed posting the guild change log in {}".format(channel.id))
+
+    def set_changelog(self, channel_id: int, guild_id: Optional[str]):
+        """Make the channel log member changes of the guild, or of no guild if ``None``."""
+        for channels in self._changelogs.values():
+            channels.discard(channel_id)
+        if guild_id:
+            self._changelogs.setdefault(guild_id, set()).add(channel_id)
+
+    async def refresh_guild(self, guild_id: str):
+        """Fetch a guild and record its members.
+
+        Errors other than the guild not existing are raised, and leave
+        the guild's last refresh time as it was."""
+        try:
+            guild = await self.api_client.background.guild(guild_id)
+        except GuildNotFound:
+            # The guild was deleted, so its members shouldn't be found in it any more
+            self.guild_index.remove(guild_id)
+        else:
+            await self.remember_guild(guild_id, guild)
+
     async def update_guilds(self):
-        """Updates the guild members for the list of known guilds.
-        This may take a while if there are a lot of them.
+        """Keeps the guild members of the known guilds up to date.
+
+        Guilds are refreshed one at a time, always the one due soonest
+        (see next_guild_refresh) next, spaced out so that each is
+        refreshed about once per REFRESH_INTERVAL. When each guild was refreshed is saved with
+        the index, so a restart carries on where it left off.
+
+        Requests are made in the rate limiter's background lane, so
+        commands keep working (and go first) while guilds are refreshed.
+        A guild that fails to refresh isn't marked as refreshed, and isn't
+        due again until a backoff of its own is over, so one broken guild
+        doesn't hold up the others. Errors that mean every request is
+        failing (the API or network being down, or the key being revoked)
+        also pause refreshing altogether for a backoff."""
+        await self.names.load()
+        await self.load_guild_index()
+        last_refresh = 0.0
+        failures = 0
+        while self == self.bot.get_cog("Hpapi"):
+            next_refresh = self.next_guild_refresh()
+            if self.api_client is None or next_refresh is None:
+                await asyncio.sleep(MAX_REFRESH_SLEEP)
+                continue
+            guild_id, due = next_refresh
+            now = time.time()
+            spacing = REFRESH_INTERVAL / len(self.guild_index)
+            due = max(due, last_refresh + spacing)
+            if due > now:
+                await asyncio.sleep(min(due - now, MAX_REFRESH_SLEEP))
+                continue
+            last_refresh = now
+            try:
+                await self.refresh_guild(guild_id)
+            except Exception as e:
+                retry_in = self.guild_refresh_failed(guild_id, now)
+                log.exception(
+                    "Failed refreshing guild {}, retrying it in {:.0f}s".format(guild_id, retry_in)
+                )
+                if fails_every_request(e):
+                    failures += 1
+                    delay = min(REFRESH_RETRY * 2 ** (failures - 1), MAX_REFRESH_SLEEP)
+                    await asyncio.sleep(delay)
+                continue
+            failures = 0
+            self._refresh_failures.pop(guild_id, None)
+
+    def next_guild_refresh(self) -> Optional[Tuple[str, float]]:
+        """Get the guild due to be refreshed soonest and when that is, if any are known.
+
+        A guild is due REFRESH_INTERVAL after it was last refreshed, or
+        once the backoff after it failed to refresh is over, whichever is
+        later."""
+        for guild_id in [g for g in self._refresh_failures if g not in self.guild_index]:
+            del self._refresh_failures[guild_id]
+        soonest = None
+        for guild_id, refreshed_at in self.guild_index.refreshed_at.items():
+            due = refreshed_at + REFRESH_INTERVAL
+            if guild_id in self._refresh_failures:
+                due = max(due, self._refresh_failures[guild_id][1])
+            if soonest is None or due < soonest[1]:
+                soonest = (guild_id, due)
+        return soonest
+
+    def guild_refresh_failed(self, guild_id: str, now: float) -> float:
+        """Back off refreshing the guild after a failure, returning how long until its retry."""
+        failed = self._refresh_failures.get(guild_id, (0, 0.0))[0] + 1
+        retry_in = min(REFRESH_RETRY * 2 ** min(failed - 1, 16), MAX_GUILD_RETRY)
+        self._refresh_failures[guild_id] = (failed, now + retry_in)
+        return retry_in
 
-        Note that [p]hypixel and all of its subcommands are disabled 
-        while the update is in progress. This is to ensure that new additions 
-        are not made while the update is in progress and to ensure this 
-        function has exclusive use of the api key during the update process"""
+    async def update_tracked(self):
+        """Keeps the tracked guild embeds up to date.
+
+        Every TRACK_INTERVAL seconds each tracked guild is fetched once,
+        however many channels show it, and only the messages whose embed
+        would change are edited. Guilds are fetched in the rate limiter's
+        background lane."""
+        await self._index_ready.wait()
         while self == self.bot.get_cog("Hpapi"):
-            com = self.bot.get_command("hypixel")
-            com.enabled = False  # disable the commands while this is in progress
-            guild_track_cmd = self.bot.get_command("hpset guild")
-            guild_track_cmd.enabled = False
-            log.info("Starting weekly guild update")
             if self.api_client is not None:
-                async with self.settings.known_guilds() as known_guilds:
-                    tmp = known_guilds
-                    for g in tmp:
-                        known_guilds.remove(g)
+                tracked = {}  # guild id -> [(channel, message id, fingerprint)]
+                for channel_id, data in (await self.settings.all_channels()).items():
+                    channel = self.bot.get_channel(channel_id)
+                    if channel is None or not data["guild_id"] or not data["message"]:
+                        continue
+                    tracked.setdefault(data["guild_id"], []).append(
+                        (channel, data["message"], data["fingerprint"])
+                    )
+                sem = asyncio.Semaphore(TRACK_CONCURRENCY)
+
+                async def update(guild_id, displays):
+                    async with sem:
                         try:
-                            guild = await self.api_client.guild(g["id"])
-                        except GuildNotFound:
-                            data = g
-                        else:
-                            data = {"id": guild.id, "members": [x.uuid for x in guild.members]}
-                        known_guilds.append(data)
-                        await asyncio.sleep(
-                            1
-                        )  # allow 1 request per second, to avoid hitting the ratelimit
-            com.enabled = True  # Done, so reenable the commands
-            guild_track_cmd.enabled = True
-            log.info("Weekly log update complete")
-            await asyncio.sleep(timedelta(weeks=1).total_seconds())  # update once per week
+                            await self.update_tracked_guild(guild_id, displays)
+                        except Exception:
+                            # One guild failing shouldn't stop the others updating
+                            log.exception("Failed updating tracked guild {}".format(guild_id))
 
-    async def update_tracked(self):
-        pass
+                await asyncio.gather(*(update(g, d) for g, d in tracked.items()))
+                log.debug("Updated {} tracked guilds".format(len(tracked)))
+            await asyncio.sleep(TRACK_INTERVAL)
+
+    async def update_tracked_guild(self, guild_id: str, displays: list):
+        try:
+            guild = await self.api_client.background.guild(guild_id)
+        except GuildNotFound:
+            return
+        await self.remember_guild(guild_id, guild)
+        embed = await get_guild_embed(guild, self.names)
+        fingerprint = embed_fingerprint(embed)
+        for channel, message_id, old_fingerprint in displays:
+            if fingerprint == old_fingerprint:
+                continue
+            try:
+                await channel.get_partial_message(message_id).edit(embed=randomize_colour(embed))
+            except discord.NotFound:
+                # The message was deleted, so stop tracking the guild there
+                await self.settings.channel(channel).clear()
+                self.set_changelog(channel.id, None)
+                continue
+            except discord.HTTPException:
+                log.exception("Failed updating the tracked guild in {}".format(channel.id))
+                continue
+            await self.settings.channel(channel).fingerprint.set(fingerprint)
 
     # End Section: Load and update
 
@@ -126,32 +392,78 @@ class Hpapi(commands.Cog):
                 _("No api key available! Use `{}` to set one!").format("[p]hpset apikey")
             )
             return
-        add_to_known = False
-        uuid = await get_player_uuid(player_name, self.api_client._session)
+        uuid = await self.names.uuid_for(player_name)
         if uuid is None:
             return await ctx.send(_("It doesn't seem like there is a player with that name."))
-        for g in await self.settings.known_guilds():
-            if uuid in g["members"]:
-                guild_id = g["id"]
-                break
-        else:
-            try:
-                guild_id = await self.api_client.find_guild_by_uuid(uuid)
-            except PlayerNotInGuild:
-                await ctx.send("The specified player does not appear to " "be in a guild")
-                return
-            else:
-                add_to_known = True
-        guild = await self.api_client.guild(guild_id)
-        em = await get_guild_embed(guild)
-        em = randomize_colour(em)
-        msg = await ctx.send(embed=em)
-        if add_to_known:  # add to list of known guilds to cut lookups.
-            data_to_add = {"id": guild_id, "members": [x.uuid for x in guild.members]}
-            async with self.settings.known_guilds() as known:
-                known.append(data_to_add)
+        try:
+            guild_id, guild = await self.get_player_guild(uuid)
+        except (PlayerNotInGuild, GuildNotFound):
+            await ctx.send("The specified player does not appear to " "be in a guild")
+            return
+        em = await get_guild_embed(guild, self.names)
+        fingerprint = embed_fingerprint(em)
+        msg = await channel.send(embed=randomize_colour(em))
+        await self.remember_guild(guild_id, guild)  # known guilds cut lookups
         await self.settings.channel(channel).guild_id.set(guild_id)
         await self.settings.channel(channel).message.set(msg.id)
+        await self.settings.channel(channel).fingerprint.set(fingerprint)
+        if await self.settings.channel(channel).changelog():
+            self.set_changelog(channel.id, guild_id)
+        if channel != ctx.channel:
+            await ctx.tick()
+
+    @hpset.command(name="changelog")
+    async def hpset_changelog(
+        self, ctx: commands.Context, channel: discord.TextChannel, enabled: bool
+    ):
+        """Sets whether a channel tracking a guild also logs members joining and leaving
+
+        Changes are noticed when the guild is refreshed, so they can show
+        up a while after they happen."""
+        guild_id = await self.settings.channel(channel).guild_id()
+        if not guild_id:
+            await ctx.send(
+                _("That channel isn't tracking a guild! Use `{}` first.").format(
+                    "[p]hpset guild"
+                )
+            )
+            return
+        await self.settings.channel(channel).changelog.set(enabled)
+        self.set_changelog(channel.id, guild_id if enabled else None)
+        await ctx.tick()
+
+    @hpset.command(name="stats")
+    @checks.is_owner()
+    async def hpset_stats(self, ctx: commands.Context):
+        """Show how up to date the known guilds are, and cache statistics"""
+        await self._index_ready.wait()
+        stalest = self.guild_index.stalest()
+        if stalest is None:
+            oldest = _("None")
+        elif not stalest[1]:
+            oldest = _("Never refreshed")
+        else:
+            oldest = humanize_timedelta(seconds=max(time.time() - stalest[1], 1))
+        msg = _(
+            "Known guilds: {} ({} players)\n"
+            "Longest since a guild was refreshed: {}\n"
+            "Cached names: {} (hit rate {:.1%})\n"
+            "Rate limit: {:.0f}/{} requests left"
+        ).format(
+            len(self.guild_index),
+            len(self.guild_index.by_member),
+            oldest,
+            len(self.names),
+            self.names.hit_rate,
+            self.ratelimit.available(),
+            self.ratelimit.limit,
+        )
+        if self.api_client is not None:
+            for endpoint, cache in self.api_client.caches.items():
+                msg += _("\nCached {} responses: {} (hit rate {:.1%})").format(
+                    endpoint, len(cache), cache.hit_rate
+                )
+        await ctx.send(msg)
 
     @hpset.command()
     @checks.is_owner()
@@ -176,11 +488,7 @@ class Hpapi(commands.Cog):
 
     @commands.group(name="hypixel", aliases=["hp"])
     async def hp(self, ctx: commands.Context):
-        """Base command for getting info from Hypixel's API
-        
-        Note that this command and all subcommands will be disabled 
-        if a guild member list update is running in order to finish 
-        that process more quickly"""
+        """Base command for getting info from Hypixel's API"""
         pass
 
     @hp.command()
@@ -191,16 +499,10 @@ class Hpapi(commands.Cog):
                 _("No api key available! Use `{}` to set one!").format("[p]hpset apikey")
             )
             return
-        boosters = await self.api_client.boosters()
-        pages = []
-        for booster in boosters:
-            if booster.length == booster.original_length:
-                continue
-            embed = await get_booster_embed(booster)
-            embed = randomize_colour(embed)
-            pages.append(embed)
-        if pages:
-            await menu(ctx, pages, DEFAULT_CONTROLS)
+        snapshot = await self.boosters.get(self.api_client, self.names)
+        if snapshot.active:
+            pages = LazyPages(snapshot.active, self.render_booster)
+            await pages.menu(ctx)
         else:
             await ctx.send(_("An error occurred in getting the data"))
 
@@ -215,18 +517,17 @@ class Hpapi(commands.Cog):
             )
             return
         game_type = GameType.from_clean_name(game)
-        boosters = await self.api_client.boosters()
-
-        game_booster = discord.utils.find(
-            lambda x: x.length < x.original_length and x.game_type == game_type, boosters
-        )
+        snapshot = await self.boosters.get(self.api_client, self.names)
+        game_booster = snapshot.for_game(game_type)
         if game_booster:
-            embed = await get_booster_embed(game_booster)
-            embed = randomize_colour(embed)
-            await ctx.send(embed=embed)
+            await ctx.send(embed=await self.render_booster(game_booster))
         else:
             await ctx.send(_("There doesn't appear to be an active booster for that game!"))
 
+    async def render_booster(self, booster: Booster) -> discord.Embed:
+        embed = await get_booster_embed(booster, self.names)
+        return randomize_colour(embed)
+
     @hp.command(name="player")
     async def hpplayer(self, ctx: commands.Context, name: str):
         """Show info for the specified player"""
@@ -236,11 +537,16 @@ class Hpapi(commands.Cog):
             )
             return
 
+        uuid = await self.names.uuid_for(name)
+        if uuid is None:
+            await ctx.send(_("That player does not exist!"))
+            return
         try:
-            player = await self.api_client.player_from_name(name)
+            player = await self.api_client.player_from_uuid(uuid)
         except PlayerNotFound:
             await ctx.send(_("That player does not exist!"))
             return
+        self.names.remember(player.displayname, uuid)
         em = await get_player_embed(player)
         em = randomize_colour(em)
         await ctx.send(embed=em)
@@ -253,28 +559,16 @@ class Hpapi(commands.Cog):
                 _("No api key available! Use `{}` to set one!").format("[p]hpset apikey")
             )
             return
-        player_uuid = await get_player_uuid(player_name, self.api_client._session)
+        player_uuid = await self.names.uuid_for(player_name)
         if player_uuid is None:
             return await ctx.send(_("It doesn't seem like there is a player with that name."))
         friends = await self.api_client.friends(player_uuid)
-        pages = []
-        msg = await ctx.send(
-            "Looking up friends for {}. This may take a while if the user has "
-            "a lot of users on their friends list".format(player_name)
-        )
-        async with ctx.channel.typing():
-            # gives some indication that the command is working, because
-            # this could take some time if the specified player has a lot
-            # of users friended on the server
-            for friend in friends:
-                em = await get_friend_embed(friend)
-                pages.append(em)
-                await asyncio.sleep(1)
-        await msg.delete()
-        if pages:
-            await menu(ctx, pages, DEFAULT_CONTROLS)
-        else:
+        if not friends:
             await ctx.send(_("That player doesn't appear to have any friends"))
+            return
+        # Pages are rendered as they're reached, so a long friends list doesn't hold up the first
+        pages = LazyPages(friends, lambda friend: get_friend_embed(friend, self.names))
+        await pages.menu(ctx)
 
     @hp.command(name="guild")
     async def hpguild(self, ctx, player_name: str):
@@ -284,30 +578,18 @@ class Hpapi(commands.Cog):
                 _("No api key available! Use `{}` to set one!").format("[p]hpset apikey")
             )
             return
-        add_to_known = False
-        uuid = await get_player_uuid(player_name, session=self.api_client._session)
+        uuid = await self.names.uuid_for(player_name)
         if uuid is None:
             return await ctx.send(_("It doesn't seem like there is a player with that name."))
-        for g in await self.settings.known_guilds():
-            if uuid in g["members"]:
-                guild_id = g["id"]
-                break
-        else:
-            try:
-                guild_id = await self.api_client.find_guild_by_uuid(uuid)
-            except PlayerNotInGuild:
-                await ctx.send(_("The specified player does not appear to " "be in a guild"))
-                return
-            else:
-                add_to_known = True
-        guild = await self.api_client.guild(guild_id)
-        em = await get_guild_embed(guild)
+        try:
+            guild_id, guild = await self.get_player_guild(uuid)
+        except (PlayerNotInGuild, GuildNotFound):
+            await ctx.send(_("The specified player does not appear to " "be in a guild"))
+            return
+        em = await get_guild_embed(guild, self.names)
         em = randomize_colour(em)
         await ctx.send(embed=em)
-        if add_to_known:  # add to list of known guilds to cut lookups.
-            data_to_add = {"id": guild_id, "members": [x.uuid for x in guild.members]}
-            async with self.settings.known_guilds() as known:
-                known.append(data_to_add)
+        await self.remember_guild(guild_id, guild)  # known guilds cut lookups
 
     @hp.command(name="session")
     async def hpsession(self, ctx, player_name: str):
@@ -316,7 +598,7 @@ class Hpapi(commands.Cog):
             await ctx.send(
                 _("No api key available! Use `{}` to set one!").format("[p]hpset apikey")
             )
-        uuid = await get_player_uuid(player_name, session=self.api_client._session)
+        uuid = await self.names.uuid_for(player_name)
         if uuid is None:
             return await ctx.send(_("It doesn't seem like there is a player with that name."))
         try:
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from aiopixel.utils import clean_uuid, get_player_name, get_player_uuid
+
+log = logging.getLogger("palmtree5.cogs.hpapi")
+
+# Seconds between a change to the cache and it being written to disk
+SAVE_DELAY = 60
+
+
+class NameCache:
+    """
+    Player names and UUIDs looked up from Mojang, kept between restarts.
+
+    Both directions are size-bounded LRU caches whose entries expire after
+    ``ttl`` seconds, since players can change their names. Names that
+    don't belong to any player are remembered too (for ``negative_ttl``),
+    so asking for them again doesn't go to Mojang either. Lookups of the
+    same name or UUID that overlap share one request.
+
+    Expiry times are wall clock times, so they still mean something after
+    the cache is loaded back from disk.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        maxsize: int = 10000,
+        ttl: float = 86400,
+        negative_ttl: float = 3600,
+    ):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.session = None
+        self._uuids = OrderedDict()  # lowercased name -> (expires_at, uuid or None)
+        self._names = OrderedDict()  # uuid without dashes -> (expires_at, name)
+        self._inflight = {}
+        self._save_handle = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._uuids) + len(self._names)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    # Lookups
+
+    async def uuid_for(self, name: str) -> Optional[str]:
+        """Get the UUID of the player with the name, or ``None`` if there isn't one."""
+        key = name.lower()
+        found, uuid = self._get(self._uuids, key)
+        if found:
+            return uuid
+        uuid = await self._single_flight(("uuid", key), get_player_uuid(name, self.session))
+        self._set(self._uuids, key, uuid, self.ttl if uuid is not None else self.negative_ttl)
+        return uuid
+
+    async def name_for(self, uuid: str) -> str:
+        """Get the current name of the player with the UUID."""
+        key = clean_uuid(uuid)
+        found, name = self._get(self._names, key)
+        if found:
+            return name
+        name = await self._single_flight(("name", key), get_player_name(key, self.session))
+        self.remember(name, key)
+        return name
+
+    def remember(self, name: str, uuid: str):
+        """Record a name and UUID known to belong together, e.g. from a player's profile."""
+        key = clean_uuid(uuid)
+        self._set(self._names, key, name, self.ttl)
+        self._set(self._uuids, name.lower(), key, self.ttl)
+
+    async def _single_flight(self, key, coro):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro)
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            coro.close()
+        return await asyncio.shield(task)
+
+    def _get(self, entries: OrderedDict, key: str):
+        entry = entries.get(key)
+        if entry is not None and entry[0] <= time.time():
+            del entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return False, None
+        entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def _set(self, entries: OrderedDict, key: str, value, ttl: float):
+        entries[key] = (time.time() + ttl, value)
+        entries.move_to_end(key)
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
+        self._schedule_save()
+
+    # Persistence
+
+    def _schedule_save(self):
+        if self._save_handle is None:
+            loop = asyncio.get_event_loop()
+            self._save_handle = loop.call_later(
+                SAVE_DELAY, lambda: asyncio.ensure_future(self.save())
+            )
+
+    async def load(self):
+        loop = asyncio.get_event_loop()
+        data = await loop.run_in_executor(None, self._read)
+        if not data:
+            return
+        now = time.time()
+        # Entries looked up since starting are newer, so they're kept over the saved ones
+        for name, saved in (("uuids", self._uuids), ("names", self._names)):
+            for key, expires_at, value in reversed(data.get(name, [])):
+                if expires_at > now and key not in saved and len(saved) < self.maxsize:
+                    saved[key] = (expires_at, value)
+                    saved.move_to_end(key, last=False)
+
+    async def save(self):
+        self._save_handle = None
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self._write, self._snapshot())
+
+    def save_now(self):
+        """Write the cache to disk right away, e.g. when the cog is unloaded."""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+            self._write(self._snapshot())
+
+    def _snapshot(self) -> dict:
+        return {
+            "uuids": [[key, expires_at, uuid] for key, (expires_at, uuid) in self._uuids.items()],
+            "names": [[key, expires_at, name] for key, (expires_at, name) in self._names.items()],
+        }
+
+    def _read(self) -> Optional[dict]:
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            log.warning("The name cache at {} is corrupt, starting over".format(self.path))
+            return None
+
+    def _write(self, data: dict):
+        tmp_path = self.path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
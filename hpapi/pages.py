@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+
+import discord
+from redbot.core import commands
+from redbot.core.utils.menus import DEFAULT_CONTROLS, menu, next_page, prev_page
+from redbot.vendored.discord.ext import menus
+
+try:
+    from redbot.core.utils.views import SimpleMenu
+except ImportError:  # Red 3.4 only has reaction menus
+    SimpleMenu = None
+
+log = logging.getLogger("palmtree5.cogs.hpapi")
+
+T = TypeVar("T")
+
+# Pages rendered ahead of the one being shown
+PREFETCH_PAGES = 3
+# Maximum number of pages rendered at once
+RENDER_CONCURRENCY = 4
+
+
+class LazyPages(menus.ListPageSource, Generic[T]):
+    """
+    Menu pages that are only rendered when they're about to be shown.
+
+    The menu starts with a placeholder for every page. Before a page is
+    shown it is rendered (if it hasn't been already), and the next few
+    pages in each direction are rendered in the background so paging
+    through doesn't wait on them.
+
+    The entries of the page source are the page numbers, and
+    ``format_page`` renders them, so button menus page through it like
+    any other source.
+    """
+
+    def __init__(
+        self,
+        items: List[T],
+        render: Callable[[T], Awaitable[discord.Embed]],
+        prefetch: int = PREFETCH_PAGES,
+        concurrency: int = RENDER_CONCURRENCY,
+    ):
+        super().__init__(list(range(len(items))), per_page=1)
+        self.items = items
+        self.render_item = render
+        self.prefetch = prefetch
+        self.pages = [discord.Embed(description="Loading...") for _ in items]
+        self._tasks: Dict[int, asyncio.Future] = {}
+        self._sem = asyncio.Semaphore(concurrency)
+
+    def __len__(self):
+        return len(self.items)
+
+    async def _render(self, index: int) -> discord.Embed:
+        async with self._sem:
+            embed = await self.render_item(self.items[index])
+        self.pages[index] = embed
+        return embed
+
+    def _task(self, index: int) -> asyncio.Future:
+        task = self._tasks.get(index)
+        if task is None:
+            task = self._tasks[index] = asyncio.ensure_future(self._render(index))
+            task.add_done_callback(self._log_failure)
+        return task
+
+    @staticmethod
+    def _log_failure(task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Failed rendering a page", exc_info=task.exception())
+
+    async def render(self, index: int) -> Optional[discord.Embed]:
+        """Render the page at the index, and start rendering the pages around it."""
+        if not self.items:
+            return None
+        index %= len(self.items)
+        # Started first, so it gets the first turn at rendering
+        task = self._task(index)
+        for offset in range(1, self.prefetch + 1):
+            self._task((index + offset) % len(self.items))
+            self._task((index - offset) % len(self.items))
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # Show the placeholder rather than breaking the menu
+            self._tasks.pop(index, None)
+            return None
+
+    async def format_page(self, menu: menus.MenuPages, index: int) -> discord.Embed:
+        return await self.render(index) or self.pages[index]
+
+    def cancel(self):
+        for task in self._tasks.values():
+            task.cancel()
+
+    def controls(self) -> dict:
+        """Get the default reaction menu controls, changed to render pages before going to them."""
+
+        def lazy(control, offset: int):
+            async def lazy_control(ctx, pages, controls, message, page, timeout, emoji, **kwargs):
+                await self.render(page + offset)
+                return await control(
+                    ctx, pages, controls, message, page, timeout, emoji, **kwargs
+                )
+
+            return lazy_control
+
+        controls = {}
+        for emoji, control in DEFAULT_CONTROLS.items():
+            if control is next_page:
+                controls[emoji] = lazy(control, 1)
+            elif control is prev_page:
+                controls[emoji] = lazy(control, -1)
+            else:
+                controls[emoji] = control
+        return controls
+
+    async def menu(self, ctx: commands.Context, timeout: float = 30.0):
+        """Show the pages in a menu, starting on the first."""
+        await self.render(0)
+        try:
+            if SimpleMenu is not None and await ctx.bot.use_buttons():
+                view = LazyMenu(self, timeout=timeout)
+                await view.start(ctx)
+                await view.wait()
+            else:
+                await menu(ctx, self.pages, self.controls(), timeout=timeout)
+        finally:
+            self.cancel()
+
+
+if SimpleMenu is not None:
+
+    class LazyMenu(SimpleMenu):
+        """A button menu of lazily rendered pages."""
+
+        def __init__(self, pages: LazyPages, **kwargs):
+            # Set first, since SimpleMenu's __init__ uses the source
+            self._lazy_source = pages
+            super().__init__(pages.pages, **kwargs)
+
+        @property
+        def source(self) -> LazyPages:
+            return self._lazy_source
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict
+
+import aiohttp
+
+log = logging.getLogger("palmtree5.cogs.hpapi")
+
+HYPIXEL_HOST = "api.hypixel.net"
+
+# Priority lanes, most urgent first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class RateLimiter:
+    """
+    A token bucket shared by every Hypixel API request.
+
+    The bucket holds up to ``limit`` tokens and refills at ``limit`` per
+    ``period`` seconds. What the API says about the key's limit in its
+    ``RateLimit-*`` response headers takes precedence: the bucket never
+    holds more tokens than the API says remain, and if none remain,
+    nothing is sent until the API's window resets.
+
+    Requests wait in one of two lanes. Interactive requests (commands)
+    are served first. Background requests only get a token when no
+    interactive request is waiting and more than ``reserve`` of the
+    bucket is left, so a background refresh never uses up the budget
+    commands need.
+    """
+
+    def __init__(self, limit: int = 120, period: float = 60, reserve: float = 0.25):
+        self.limit = limit
+        self.period = period
+        self.reserve = reserve
+        self.tokens = float(limit)
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._waiters: Dict[int, deque] = {INTERACTIVE: deque(), BACKGROUND: deque()}
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.period
+
+    def _refill(self, now: float):
+        self.tokens = min(self.tokens + (now - self._updated) * self.rate, self.limit)
+        self._updated = now
+
+    def available(self) -> float:
+        """Get the number of tokens in the bucket right now."""
+        self._refill(time.monotonic())
+        return self.tokens
+
+    def _needed(self, lane: int) -> float:
+        """Get the number of tokens that must be in the bucket for the lane to take one."""
+        if lane == INTERACTIVE:
+            return 1
+        return 1 + self.reserve * self.limit
+
+    def _delay(self, lane: int, now: float) -> float:
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        return max((self._needed(lane) - self.tokens) / self.rate, 0.05)
+
+    async def acquire(self, lane: int = INTERACTIVE):
+        """Wait for a token in the given lane, then take it."""
+        waiters = self._waiters[lane]
+        me = object()
+        waiters.append(me)
+        try:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if (
+                    waiters[0] is me
+                    and self.blocked_until <= now
+                    and self.tokens >= self._needed(lane)
+                    and not any(self._waiters[more] for more in range(lane))
+                ):
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep(self._delay(lane, now))
+        finally:
+            waiters.remove(me)
+
+    def update_from_headers(self, headers):
+        """Adjust the bucket to what a Hypixel response says about the key's limit."""
+        try:
+            limit = int(headers["RateLimit-Limit"])
+            remaining = int(headers["RateLimit-Remaining"])
+            reset = float(headers["RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        now = time.monotonic()
+        self._refill(now)
+        if limit != self.limit:
+            log.debug("The API key's rate limit is {} requests".format(limit))
+            self.limit = limit
+        self.tokens = min(self.tokens, remaining)
+        if remaining <= 0:
+            self.blocked_until = max(self.blocked_until, now + reset)
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """Get a trace config that feeds Hypixel's rate limit headers back into the bucket."""
+
+        async def on_request_end(session, context, params):
+            if params.url.host == HYPIXEL_HOST:
+                self.update_from_headers(params.response.headers)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
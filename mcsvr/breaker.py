@@ -0,0 +1,90 @@
+import time
+from typing import Hashable, Optional
+
+from .cache import StatusCache
+
+
+class CircuitOpen(Exception):
+    """Returned instead of checking a server that has failed too many checks in a row."""
+
+    def __init__(self, address: str, last_seen: Optional[float], retry_in: float):
+        self.address = address
+        self.last_seen = last_seen
+        self.retry_in = retry_in
+        super().__init__(
+            "The server has failed several checks in a row, so it won't be checked "
+            "again for {:.0f} seconds.".format(retry_in)
+        )
+
+
+class BreakerState:
+    __slots__ = ("failures", "trips", "open_until", "last_seen")
+
+    def __init__(self):
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.last_seen = None
+
+
+class CircuitBreaker:
+    """
+    Stops checking servers that keep failing, for a while.
+
+    After ``threshold`` consecutive failed checks the circuit for a server
+    opens and it isn't checked for ``cooldown`` seconds. Once that's over a
+    single check is let through: if it fails too the circuit opens again
+    for twice as long (up to ``max_cooldown``), and if it succeeds the
+    server is checked normally again.
+
+    The time each server was last reachable is remembered, for showing
+    how long an offline server has been gone.
+    """
+
+    def __init__(
+        self,
+        threshold: int = 3,
+        cooldown: float = 60,
+        max_cooldown: float = 3600,
+        maxsize: int = 4096,
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._states = StatusCache(maxsize=maxsize, ttl=7 * 86400)
+        self.skipped = 0
+
+    def check(self, key: Hashable, address: str, now: float) -> Optional[CircuitOpen]:
+        """Get the error to return instead of checking the server, or ``None`` to check it."""
+        error = self.error(key, address, now)
+        if error is not None:
+            self.skipped += 1
+        return error
+
+    def record(self, key: Hashable, ok: bool, now: float):
+        state = self._states.get(key)
+        if state is None:
+            state = BreakerState()
+        # Set on every check, so only servers that stopped being checked expire
+        self._states.set(key, state)
+        if ok:
+            state.failures = 0
+            state.trips = 0
+            state.open_until = 0.0
+            state.last_seen = time.time()
+            return
+        state.failures += 1
+        if state.failures >= self.threshold:
+            cooldown = min(self.cooldown * 2 ** min(state.trips, 16), self.max_cooldown)
+            state.trips += 1
+            state.open_until = now + cooldown
+
+    def error(self, key: Hashable, address: str, now: float) -> Optional[CircuitOpen]:
+        """Get the error for a server whose circuit is open, even if it was just checked."""
+        state = self._states.get(key)
+        if state is None or state.open_until <= now:
+            return None
+        return CircuitOpen(address, state.last_seen, state.open_until - now)
+
+    def open_count(self, now: float) -> int:
+        return sum(1 for state in self._states.values() if state.open_until > now)
@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+
+class StatusCache:
+    """
+    A size-bounded LRU cache for server status checks.
+
+    Successful and failed checks are kept for different lengths of time,
+    so an unreachable server is not re-checked on every lookup while a
+    reachable one still refreshes reasonably often.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 180, negative_ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get the cached value for the key, or ``default`` if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, *, failed: bool = False, ttl: Optional[float] = None):
+        """
+        Cache a value for the key.
+
+        ``failed`` selects the negative TTL. ``ttl`` overrides both.
+        """
+        if ttl is None:
+            ttl = self.negative_ttl if failed else self.ttl
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def values(self) -> List[Any]:
+        """Get every value that hasn't expired, without counting hits or misses."""
+        now = time.monotonic()
+        return [value for expires_at, value in self._entries.values() if expires_at > now]
+
+    def clear(self):
+        self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
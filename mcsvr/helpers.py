@@ -1,39 +1,24 @@
 import ipaddress
+import json
 import logging
-import socket
-from typing import Union
+import re
+from typing import Any, List, Optional, Tuple
 
 import discord
 import validators
-from mcstatus.pinger import PingResponse
-from mcstatus.bedrock_status import BedrockStatusResponse
+
+from .breaker import CircuitOpen
 
 log = logging.getLogger("red.mcsvr")
 
-MC_FORMATTING_CODES = [
-    "§0",
-    "§1",
-    "§2",
-    "§3",
-    "§4",
-    "§5",
-    "§6",
-    "§7",
-    "§8",
-    "§9",
-    "§a",
-    "§b",
-    "§c",
-    "§d",
-    "§e",
-    "§f",
-    "§k",
-    "§l",
-    "§m",
-    "§n",
-    "§o",
-    "§r",
-]
+EDITIONS = ("java", "bedrock")
+
+# Discord's limits on a single embed
+EMBED_MAX_FIELDS = 25
+EMBED_MAX_CHARS = 6000
+
+# Matches legacy formatting codes, including the §x§r§r§g§g§b§b hex color form
+FORMATTING_CODE_RE = re.compile(r"§(?:x(?:§[0-9a-fA-F]){6}|[0-9a-fk-orA-FK-OR])")
 
 
 def is_valid_ip(addr: str):
@@ -52,136 +37,248 @@ def is_valid_ip(addr: str):
     return True
 
 
-def get_server_string(mc_server, server_ip):
+def embed_fingerprint(embed: discord.Embed) -> int:
+    """Get a hash of the embed's content, for telling whether it changed."""
+    return hash(json.dumps(embed.to_dict(), sort_keys=True))
+
+
+def clean_motd(motd) -> str:
+    """
+    Get the plain text of a MOTD.
+
+    The MOTD may be a string with formatting codes or a JSON chat
+    component (as a dict, or a list of them), as servers send either.
+    """
+    if not isinstance(motd, str):
+        motd = "".join(_component_text(motd))
+    return FORMATTING_CODE_RE.sub("", motd).strip()
+
+
+def _component_text(component):
+    if isinstance(component, str):
+        yield component
+    elif isinstance(component, list):
+        for part in component:
+            yield from _component_text(part)
+    elif isinstance(component, dict):
+        yield component.get("text", "")
+        for part in component.get("extra", ()):
+            yield from _component_text(part)
+
+
+class ServerSnapshot:
+    """
+    The parts of a status response that get displayed, normalized across editions.
+
+    Snapshots are made once per check and are not changed after, so the
+    topic text and embed for one are only rendered once no matter how
+    many times (or in how many channels) they get shown.
+    """
+
+    __slots__ = (
+        "address",
+        "edition",
+        "online",
+        "max_online",
+        "version",
+        "brand",
+        "motd",
+        "players",
+        "gamemode",
+        "_text",
+        "_embed",
+        "_fingerprint",
+    )
+
+    def __init__(
+        self,
+        address: str,
+        edition: str,
+        online: int,
+        max_online: int,
+        version: str,
+        brand: str = None,
+        motd: str = None,
+        players: Tuple[str, ...] = (),
+        gamemode: str = None,
+    ):
+        self.address = address
+        self.edition = edition
+        self.online = online
+        self.max_online = max_online
+        self.version = version
+        self.brand = brand
+        self.motd = motd
+        self.players = players
+        self.gamemode = gamemode
+        self._text = None
+        self._embed = None
+        self._fingerprint = None
+
+    @classmethod
+    def from_response(cls, address: str, resp) -> "ServerSnapshot":
+        """Make a snapshot from a Java server's status response."""
+        description = resp.raw.get("description")
+        sample = resp.players.sample or ()
+        return cls(
+            address,
+            "java",
+            resp.players.online,
+            resp.players.max,
+            resp.version.name,
+            motd=clean_motd(description) if description else None,
+            players=tuple(p.name for p in sample),
+        )
+
+    @classmethod
+    def from_bedrock_pong(cls, address: str, data: bytes) -> "ServerSnapshot":
+        """Make a snapshot from the ``MCPE;motd;protocol;version;...`` info in a pong."""
+        info = data.decode("utf-8", "replace").split(";")
+        return cls(
+            address,
+            "bedrock",
+            int(info[4]),
+            int(info[5]),
+            info[3],
+            brand=info[0],
+            motd=clean_motd(info[1]) if info[1] else None,
+            gamemode=info[8] if len(info) > 8 else None,
+        )
+
+    def with_players(self, players: Tuple[str, ...]) -> "ServerSnapshot":
+        """Get a copy of the snapshot with a different player list."""
+        return ServerSnapshot(
+            self.address,
+            self.edition,
+            self.online,
+            self.max_online,
+            self.version,
+            brand=self.brand,
+            motd=self.motd,
+            players=tuple(players),
+            gamemode=self.gamemode,
+        )
+
+    def _fields(self) -> List[Tuple[str, str]]:
+        count = "{}/{}".format(self.online, self.max_online)
+        fields = [("Online", "Yes"), ("Online count", count)]
+        if self.gamemode:
+            fields.append(("Game mode", self.gamemode))
+        fields.append(("Version", self.version))
+        if self.brand:
+            fields.append(("Type", self.brand))
+        if self.motd:
+            fields.append(("MOTD", self.motd))
+        return fields
+
+    def text(self) -> str:
+        """Render the snapshot as text, for channel topics."""
+        if self._text is None:
+            data = "Server info for {}:\n\n".format(self.address)
+            for name, value in self._fields():
+                data += "{}: {}\n".format(name, value)
+                if name == "Online count" and self.players:
+                    data += "Players online: {}\n".format(_player_list(self.players, 5))
+            self._text = data.strip()
+        return self._text
+
+    def embed(self) -> discord.Embed:
+        """
+        Render the snapshot as an embed.
+
+        The same embed object is returned every time, so it must not be modified.
+        """
+        if self._embed is None:
+            emb = discord.Embed(title="Server info for {}".format(self.address))
+            for name, value in self._fields():
+                emb.add_field(name=name, value=value[:1024])
+            if self.players:
+                emb.set_footer(text="Players online: {}".format(_player_list(self.players, 20)))
+            self._embed = emb
+        return self._embed
+
+    def fingerprint(self) -> int:
+        if self._fingerprint is None:
+            self._fingerprint = embed_fingerprint(self.embed())
+        return self._fingerprint
+
+    def compact(self) -> str:
+        """Render the snapshot as one line, for dashboards."""
+        return "Online | {}/{} players | {}".format(self.online, self.max_online, self.version)
+
+
+def _player_list(players: Tuple[str, ...], limit: int) -> str:
+    if len(players) > limit:
+        return ", ".join(players[:limit]) + " and {} more".format(len(players) - limit)
+    return ", ".join(players)
+
+
+def _last_seen(last_seen: Optional[float]) -> str:
+    # A Discord timestamp, so the display stays the same while the time shown counts up
+    if last_seen is None:
+        return ""
+    return " (last seen <t:{}:R>)".format(int(last_seen))
+
+
+def get_server_string(
+    mc_server: Optional[ServerSnapshot], server_ip: str, last_seen: Optional[float] = None
+) -> str:
     if mc_server is None:
         data = "Server info for {}:\n\n".format(server_ip)
-        data += "Online: No"
+        data += "Online: No" + _last_seen(last_seen)
         return data
-    else:
-        if isinstance(mc_server, PingResponse):
-            return java_string(mc_server, server_ip)
-        elif isinstance(mc_server, BedrockStatusResponse):
-            return bedrock_string(mc_server, server_ip)
-
-
-def java_string(mc_server, server_ip):
-    players = None
-    brand = None
-    motd = None
-    if hasattr(mc_server, "software"):
-        players = mc_server.players.names
-        version = mc_server.software.version
-        brand = mc_server.software.brand
-        motd = mc_server.motd
-    else:
-        version = mc_server.version.name
-    online_count = mc_server.players.online
-    max_count = mc_server.players.max
-    data = "Server info for {}:\n\n".format(server_ip)
-    data += "Online: Yes\n"
-    data += "Online count: {}/{}\n".format(online_count, max_count)
-    if players:
-        s = "Players online: {}\n"
-        if len(players) > 5:
-            s.format(", ".join(players[:5]) + " and {} more".format(len(players[5:])))
-        else:
-            s.format(", ".join(players))
-        data += s
-    data += "Version: {}\n".format(version)
-    if brand:
-        data += "Type: {}\n".format(brand)
-    if motd:
-        for code in MC_FORMATTING_CODES:
-            if code in motd:
-                motd = motd.replace(code, "")
-        data += "MOTD: {}\n".format(motd)
-    return data.strip()
-
-
-def bedrock_string(mc_server, server_ip):
-    version = mc_server.version.version
-    brand = mc_server.version.brand
-    motd = mc_server.motd
-    online_count = mc_server.players_online
-    max_count = mc_server.players_max
-    gamemode = mc_server.gamemode
-
-    data = "Server info for {}:\n\n".format(server_ip)
-    data += "Online: Yes\n"
-    data += "Online count: {}/{}\n".format(online_count, max_count)
-    data += "Game mode: {}\n".format(gamemode)
-    data += "Version: {}\n".format(version)
-    if brand:
-        data += "Type: {}\n".format(brand)
-    if motd:
-        for code in MC_FORMATTING_CODES:
-            if code in motd:
-                motd = motd.replace(code, "")
-        data += "MOTD: {}\n".format(motd)
-    return data.strip()
-
-
-def get_server_embed(mc_server, server_ip):
+    return mc_server.text()
+
+
+def get_server_embed(
+    mc_server: Optional[ServerSnapshot], server_ip: str, last_seen: Optional[float] = None
+) -> discord.Embed:
     if mc_server is None:
         emb = discord.Embed(title="Server info for {}".format(server_ip))
-        emb.add_field(name="Online", value="No")
+        emb.add_field(name="Online", value="No" + _last_seen(last_seen))
         return emb
-    else:
-        if isinstance(mc_server, PingResponse):
-            return java_embed(mc_server, server_ip)
-        elif isinstance(mc_server, BedrockStatusResponse):
-            return bedrock_embed(mc_server, server_ip)
-    
-
-def java_embed(mc_server, server_ip):
-    players = None
-    brand = None
-    motd = None
-    if hasattr(mc_server, "software"):
-        players = mc_server.players.names
-        version = mc_server.software.version
-        brand = mc_server.software.brand
-        motd = mc_server.motd
-    else:
-        version = mc_server.version.name
-    online_count = mc_server.players.online
-    max_count = mc_server.players.max
-    emb = discord.Embed(title="Server info for {}".format(server_ip))
-    emb.add_field(name="Online", value="Yes")
-    emb.add_field(name="Online count", value="{}/{}".format(online_count, max_count))
-    if players:
-        emb.set_footer(text="Players online: {}".format(", ".join(players)))
-    emb.add_field(name="Version", value=version)
-    if brand:
-        emb.add_field(name="Type", value=brand)
-    if motd:
-        for code in MC_FORMATTING_CODES:
-            if code in motd:
-                motd = motd.replace(code, "")
-        emb.add_field(name="MOTD", value=motd)
-
-    return emb
-
-
-def bedrock_embed(mc_server, server_ip):
-    version = mc_server.version.version
-    brand = mc_server.version.brand
-    motd = mc_server.motd
-    online_count = mc_server.players_online
-    max_count = mc_server.players_max
-    gamemode = mc_server.gamemode
-    
-    emb = discord.Embed(title="Server info for {}".format(server_ip))
-    emb.add_field(name="Online", value="Yes")
-    emb.add_field(name="Online count", value="{}/{}".format(online_count, max_count))
-    emb.add_field(name="Game mode", value=gamemode)
-    emb.add_field(name="Version", value=version)
-    if brand:
-        emb.add_field(name="Type", value=brand)
-    if motd:
-        for code in MC_FORMATTING_CODES:
-            if code in motd:
-                motd = motd.replace(code, "")
-        emb.add_field(name="MOTD", value=motd)
-
-    return emb
+    return mc_server.embed()
+
+
+def compact_status(mc_server) -> str:
+    """Get a one line summary of a server's status, for dashboards."""
+    if mc_server is None:
+        return "Not checked yet"
+    if isinstance(mc_server, CircuitOpen):
+        return "Offline" + _last_seen(mc_server.last_seen)
+    if isinstance(mc_server, (str, Exception)):
+        return "Offline"
+    return mc_server.compact()
+
+
+def get_dashboard_embeds(servers: List[Tuple[str, Any]]) -> List[discord.Embed]:
+    """
+    Render many servers as fields of as few embeds as possible.
+
+    ``servers`` is a list of (server address, status) pairs, where the
+    status is ``None`` if the server hasn't been checked yet. A new
+    embed is started whenever one would go over Discord's field or
+    character limits.
+    """
+    title = "Server status"
+    footer_reserve = 32  # room for the page footer added at the end
+    embeds = []
+    emb = None
+    size = 0
+    for server_ip, mc_server in servers:
+        name = server_ip[:256]
+        value = compact_status(mc_server)[:1024]
+        if (
+            emb is None
+            or len(emb.fields) >= EMBED_MAX_FIELDS
+            or size + len(name) + len(value) > EMBED_MAX_CHARS - footer_reserve
+        ):
+            emb = discord.Embed(title=title)
+            embeds.append(emb)
+            size = len(title)
+        emb.add_field(name=name, value=value, inline=False)
+        size += len(name) + len(value)
+    if len(embeds) > 1:
+        for page, emb in enumerate(embeds, 1):
+            emb.set_footer(text="Page {}/{}".format(page, len(embeds)))
+    return embeds
@@ -0,0 +1,106 @@
+from array import array
+from typing import List, Optional, Tuple
+
+# name -> (seconds per bucket, number of buckets). Buckets are no narrower than the
+# tracker's 300 second base interval, so a steadily checked server has a sample in each
+TIERS = {"hour": (300, 12), "day": (1800, 48), "week": (10800, 56)}
+
+RAW_SAMPLES = 128
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+class RingSeries:
+    """
+    Averages of samples over fixed-width time buckets, in a fixed-size ring.
+
+    Each slot remembers which bucket it holds, so stale slots left over
+    from a gap in the samples are ignored rather than shown as data.
+    """
+
+    __slots__ = ("width", "size", "_buckets", "_sums", "_counts")
+
+    def __init__(self, width: int, size: int):
+        self.width = width
+        self.size = size
+        self._buckets = array("q", [-1]) * size
+        self._sums = array("d", [0.0]) * size
+        self._counts = array("L", [0]) * size
+
+    def add(self, timestamp: float, value: float):
+        bucket = int(timestamp // self.width)
+        slot = bucket % self.size
+        if self._buckets[slot] != bucket:
+            self._buckets[slot] = bucket
+            self._sums[slot] = 0.0
+            self._counts[slot] = 0
+        self._sums[slot] += value
+        self._counts[slot] += 1
+
+    def values(self, now: float) -> List[Optional[float]]:
+        """Get the average of each bucket up to ``now``, oldest first (``None`` if empty)."""
+        current = int(now // self.width)
+        values = []
+        for bucket in range(current - self.size + 1, current + 1):
+            slot = bucket % self.size
+            if self._buckets[slot] == bucket and self._counts[slot]:
+                values.append(self._sums[slot] / self._counts[slot])
+            else:
+                values.append(None)
+        return values
+
+
+class PlayerHistory:
+    """
+    Player count history for one server, using constant memory.
+
+    The most recent ``RAW_SAMPLES`` samples are kept as-is, and every sample
+    is also folded into the downsampled hour/day/week tiers.
+    """
+
+    __slots__ = ("tiers", "_times", "_counts", "_next", "_filled")
+
+    def __init__(self):
+        self.tiers = {name: RingSeries(width, size) for name, (width, size) in TIERS.items()}
+        self._times = array("d", [0.0]) * RAW_SAMPLES
+        self._counts = array("q", [0]) * RAW_SAMPLES
+        self._next = 0
+        self._filled = 0
+
+    def add(self, timestamp: float, online: int):
+        # Some servers report nonsense like -1 players; that's recorded as nobody online
+        online = max(online, 0)
+        self._times[self._next] = timestamp
+        self._counts[self._next] = online
+        self._next = (self._next + 1) % RAW_SAMPLES
+        self._filled = min(self._filled + 1, RAW_SAMPLES)
+        for tier in self.tiers.values():
+            tier.add(timestamp, online)
+
+    def samples(self) -> List[Tuple[float, int]]:
+        """Get the raw (timestamp, online count) samples, oldest first."""
+        start = (self._next - self._filled) % RAW_SAMPLES
+        return [
+            (self._times[i % RAW_SAMPLES], self._counts[i % RAW_SAMPLES])
+            for i in range(start, start + self._filled)
+        ]
+
+    def series(self, tier: str, now: float) -> List[Optional[float]]:
+        return self.tiers[tier].values(now)
+
+
+def sparkline(values: List[Optional[float]]) -> str:
+    """Draw the values as a line of block characters, with gaps for missing values."""
+    present = [v for v in values if v is not None]
+    if not present:
+        return " " * len(values)
+    top = max(present)
+    line = ""
+    for value in values:
+        if value is None:
+            line += " "
+        elif top == 0:
+            line += SPARK_CHARS[0]
+        else:
+            line += SPARK_CHARS[round(value / top * (len(SPARK_CHARS) - 1))]
+    return line
@@ -1,53 +1,125 @@
 import asyncio
 import logging
-from datetime import datetime, timezone as tz
+import time
+from collections import deque
 from functools import partial
-from typing import Union
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import discord
 from redbot.core import Config, checks, commands
 from redbot.core.bot import Red
 from redbot.core.i18n import Translator
-from mcstatus import JavaServer, BedrockServer
-from mcstatus.pinger import PingResponse
+from redbot.core.utils.chat_formatting import box
+from mcstatus import JavaServer
 
-from .helpers import get_server_embed, is_valid_ip, get_server_string
+from .breaker import CircuitBreaker, CircuitOpen
+from .cache import StatusCache
+from .history import TIERS, PlayerHistory, sparkline
+from .resolver import Resolver
+from .scheduler import PollScheduler
+from .udp import DatagramProber
+from .tracker import (
+    DASHBOARD,
+    DEFAULT_POLL_INTERVAL,
+    TOPIC_EDIT_WINDOW,
+    TOPIC_EDITS,
+    TOPIC_INTERVAL,
+    ServerKey,
+    TrackerIndex,
+)
+from .helpers import (
+    EDITIONS,
+    ServerSnapshot,
+    embed_fingerprint,
+    get_dashboard_embeds,
+    get_server_embed,
+    get_server_string,
+    is_valid_ip,
+)
 
 log = logging.getLogger("red.mcsvr")
 
 _ = Translator("Mcsvr", __file__)
 
+TRACKER_MODES = ("text", "embed", "dashboard")
+
+# Maximum number of server checks (and tracker display edits) run at once
+PROBE_CONCURRENCY = 32
+# Cached in place of a query result for servers that don't answer queries
+NO_QUERY = ()
+# Maximum number of channels cleaned up at once when the tracker mode changes
+CLEANUP_CONCURRENCY = 5
+# Minimum seconds between edits of the cleanup progress message
+PROGRESS_INTERVAL = 2
+# Servers due within this many seconds of each other are checked together
+POLL_SLACK = 5
+# Longest the tracker sleeps before picking up newly tracked servers
+MAX_POLL_SLEEP = 60
+# Range allowed for the server check timeouts, in seconds
+MIN_TIMEOUT = 0.5
+MAX_TIMEOUT = 30
+
 
 class Mcsvr(commands.Cog):
     """
     Get info about a Minecraft server.
 
-    This only supports Java edition servers at this time.
+    Both Java and Bedrock edition servers are supported.
 
     Also available is a server tracker that allows displaying a server and
     automatically updating its information while the cog is loaded."""
 
-    default_channel = {"server_ip": "", "original_topic": "", "servers": []}
+    default_channel = {
+        "server_ip": "",
+        "edition": "",
+        "original_topic": "",
+        "servers": [],
+        "dashboard_servers": [],
+        "dashboard_messages": [],
+    }
+
+    default_guild = {"tracker_mode": "text", "poll_interval": DEFAULT_POLL_INTERVAL}
 
-    default_guild = {"tracker_mode": "text"}
+    default_global = {"connect_timeout": 3.0, "read_timeout": 3.0}
 
     def __init__(self, bot: Red):
         self.bot = bot
         self.config = Config.get_conf(self, identifier=59595922, force_registration=True)
-        self._svr_cache = {}
+        self._svr_cache = StatusCache(maxsize=1024, ttl=180, negative_ttl=60)
+        self._inflight = {}  # (server address, edition) -> task for the check in progress
+        self._editions = StatusCache(maxsize=4096, ttl=86400)  # last edition seen per address
+        self._resolver = Resolver()
+        self._udp = DatagramProber()
+        # Java server address -> query result, or NO_QUERY if the server didn't answer
+        self._queries = StatusCache(maxsize=1024, ttl=180, negative_ttl=600)
+        self._breaker = CircuitBreaker(threshold=3, cooldown=60, max_cooldown=3600)
+        self._connect_timeout = self.default_global["connect_timeout"]
+        self._read_timeout = self.default_global["read_timeout"]
+        self._tracker = TrackerIndex()
+        self._tracker_ready = asyncio.Event()
+        self._scheduler = PollScheduler(base_interval=300, max_interval=3600)
+        self._latest = {}  # (server address, edition) -> result of the last tracker check
+        self._history = {}  # server address -> PlayerHistory
+        self._last_rendered = {}  # (channel id, message id or None) -> fingerprint of the display
+        self._topic_edits = {}  # channel id -> deque of when its latest topic edits were made
+        self._edits_made = 0
+        self._edits_skipped = 0
         self.config.register_channel(**self.default_channel)
         self.config.register_guild(**self.default_guild)
+        self.config.register_global(**self.default_global)
         self.svr_chk_task = self.bot.loop.create_task(self.server_check_loop())
 
     def cog_unload(self):
         self.svr_chk_task.cancel()
+        self._udp.close()
 
-    @commands.command()
-    async def mcserver(self, ctx: commands.Context, server_ip: str):
+    @commands.group(invoke_without_command=True)
+    async def mcserver(self, ctx: commands.Context, server_ip: str, edition: str = None):
         """
         Display info about the specified server
 
-        Server type must either be 'Java' or 'Bedrock'
+        Both Java and Bedrock servers are checked for unless the
+        edition is given as either `java` or `bedrock`
         """
         if not is_valid_ip(server_ip):
             await ctx.send(
@@ -57,48 +129,83 @@ class Mcsvr(commands.Cog):
                 "of 0-65535). Please check what you entered."
             )
             return
-        if not self.server_ip_in_cache(server_ip, ctx.message.created_at.timestamp()):
-            svr = await self.check_server(server_ip)
-            if isinstance(svr, (str, Exception)):  # An error occurred, send that and stop
-                return await ctx.send(f"An error occured. Message: {svr}")
-            self._svr_cache[server_ip] = {
-                "resp": svr,
-                "invalid_at": ctx.message.created_at.timestamp() + 180,
-            }
-        else:
-            svr = self._svr_cache[server_ip]["resp"]
+        if edition is not None:
+            edition = edition.lower()
+            if edition not in EDITIONS:
+                await ctx.send(_("The edition must be one of {}").format(", ".join(EDITIONS)))
+                return
+        svr = await self.get_status(server_ip, edition)
+        if isinstance(svr, (str, Exception)):  # An error occurred, send that and stop
+            return await ctx.send(f"An error occured. Message: {svr}")
+        if svr.edition == "java" and svr.online and not svr.players:
+            svr = await self.query_players(svr, edition)
         resp = get_server_embed(svr, server_ip)
         await ctx.send(embed=resp)
 
+    @mcserver.command(name="history")
+    async def mcserver_history(self, ctx: commands.Context, server_ip: str):
+        """
+        Show the player count history of a tracked server
+        """
+        history = self._history.get(server_ip)
+        if history is None:
+            await ctx.send(
+                _(
+                    "I don't have any history for that server. Player counts are "
+                    "only recorded for servers tracked in a channel."
+                )
+            )
+            return
+        now = time.time()
+        lines = []
+        for tier in TIERS:
+            values = history.series(tier, now)
+            present = [v for v in values if v is not None]
+            if present:
+                summary = "min {:.0f}, max {:.0f}".format(min(present), max(present))
+            else:
+                summary = "no data"
+            lines.append("{:<5} {} ({})".format(tier.title(), sparkline(values), summary))
+        await ctx.send(
+            _("Player count history for {} over the last hour, day and week:").format(server_ip)
+            + box("\n".join(lines))
+        )
+
     @commands.command()
     @commands.guild_only()
     @checks.admin_or_permissions(manage_channels=True)
     async def addserver(
-        self, ctx: commands.Context, server_ip: str, channel: discord.TextChannel = None
+        self,
+        ctx: commands.Context,
+        server_ip: str,
+        channel: Optional[discord.TextChannel] = None,
+        edition: str = None,
     ):
         """
         Set a server to track.
 
-        The server info will be used for the channel's description.
+        In text mode, the server info will be used for the channel's
+        description. In embed mode, each server gets its own message, and
+        in dashboard mode all of the channel's servers share one.
+        The edition can be set to `java` or `bedrock` to only check for
+        that kind of server.
         """
         if not channel:
             channel = ctx.channel
+        if edition is not None:
+            edition = edition.lower()
+            if edition not in EDITIONS:
+                await ctx.send(_("The edition must be one of {}").format(", ".join(EDITIONS)))
+                return
 
         tracker_mode = await self.config.guild(ctx.guild).tracker_mode()
         if tracker_mode == "text" and not channel.permissions_for(ctx.guild.me).manage_channels:
             await ctx.send(_("I do not have permissions to manage channels!"))
             return
         if is_valid_ip(server_ip):
-            if not self.server_ip_in_cache(server_ip, ctx.message.created_at.timestamp()):
-                svr = await self.check_server(server_ip)
-                if isinstance(svr, (str, Exception)):  # An error occurred, send that and stop
-                    return await ctx.send(f"An error occured. Message: {svr}")
-                self._svr_cache[server_ip] = {
-                    "resp": svr,
-                    "invalid_at": ctx.message.created_at.timestamp() + 180,
-                }
-            else:
-                svr = self._svr_cache[server_ip]["resp"]
+            svr = await self.get_status(server_ip, edition)
+            if isinstance(svr, (str, Exception)):  # An error occurred, send that and stop
+                return await ctx.send(f"An error occured. Message: {svr}")
             if tracker_mode == "text":
                 current_ip = await self.config.channel(channel).server_ip()
                 if current_ip:
@@ -106,10 +213,15 @@ class Mcsvr(commands.Cog):
                     return
                 resp = get_server_string(svr, server_ip)
                 await self.config.channel(channel).server_ip.set(server_ip)
+                await self.config.channel(channel).edition.set(edition or "")
                 await self.config.channel(channel).original_topic.set(channel.topic)
                 await channel.edit(topic=resp)
+                await self._tracker_ready.wait()
+                self._tracker.add(channel.id, None, server_ip, edition)
+                self._last_rendered[channel.id, None] = hash(resp)
+                self.topic_edited(channel.id, time.monotonic())
                 await ctx.tick()
-            else:
+            elif tracker_mode == "embed":
                 current_server_list = await self.config.channel(channel).servers()
                 for server in current_server_list:
                     if server["server_ip"] == server_ip:
@@ -117,9 +229,25 @@ class Mcsvr(commands.Cog):
                         return
                 resp = get_server_embed(svr, server_ip)
                 msg = await channel.send(embed=resp)
+                self._last_rendered[channel.id, msg.id] = svr.fingerprint()
 
-                current_server_list.append({"server_ip": server_ip, "message": msg.id})
+                current_server_list.append(
+                    {"server_ip": server_ip, "message": msg.id, "edition": edition or ""}
+                )
                 await self.config.channel(channel).servers.set(current_server_list)
+                await self._tracker_ready.wait()
+                self._tracker.add(channel.id, msg.id, server_ip, edition)
+            else:
+                async with self.config.channel(channel).dashboard_servers() as servers:
+                    if any(s["server_ip"] == server_ip for s in servers):
+                        await ctx.send(_("This server is already being tracked in this channel!"))
+                        return
+                    servers.append({"server_ip": server_ip, "edition": edition or ""})
+                await self._tracker_ready.wait()
+                self._tracker.add_to_dashboard(channel.id, server_ip, edition)
+                self._latest[server_ip, edition] = svr
+                await self.render_dashboard(channel)
+                await ctx.tick()
         else:
             await ctx.send(_("That is not a valid server IP!"))
 
@@ -137,14 +265,30 @@ class Mcsvr(commands.Cog):
         tracker_mode = await self.config.guild(ctx.guild).tracker_mode()
         if tracker_mode == "text":
             await self.config.channel(channel).server_ip.set("")
+            await self.config.channel(channel).edition.set("")
             orig_topic = await self.config.channel(channel).original_topic()
             await channel.edit(topic=orig_topic)
             await self.config.channel(channel).original_topic.set("")
+            await self._tracker_ready.wait()
+            self._tracker.remove(channel.id, None)
+            self._last_rendered.pop((channel.id, None), None)
+            await ctx.tick()
+        elif server_ip is None:
+            await ctx.send(
+                "Tracker is in {} mode but no server was passed to remove!".format(tracker_mode)
+            )
+        elif tracker_mode == "dashboard":
+            async with self.config.channel(channel).dashboard_servers() as servers:
+                new_servers = [s for s in servers if s["server_ip"] != server_ip]
+                if len(new_servers) == len(servers):
+                    await ctx.send("I was not tracking that server!")
+                    return
+                servers[:] = new_servers
+            await self._tracker_ready.wait()
+            self._tracker.remove_from_dashboard(channel.id, server_ip)
+            await self.render_dashboard(channel)
             await ctx.tick()
         else:
-            if server_ip is None:
-                await ctx.send("Tracker is in embed mode but no server was passed to remove!")
-                return
             servers = await self.config.channel(channel).servers()
             for server in servers:
                 if server["server_ip"] == server_ip:
@@ -153,10 +297,15 @@ class Mcsvr(commands.Cog):
             else:
                 await ctx.send("I was not tracking that server!")
                 return
-            msg = await channel.fetch_message(to_remove["message"])
-            await msg.delete()
+            try:
+                await channel.get_partial_message(to_remove["message"]).delete()
+            except discord.NotFound:
+                pass
             servers.remove(to_remove)
             await self.config.channel(channel).servers.set(servers)
+            await self._tracker_ready.wait()
+            self._tracker.remove(channel.id, to_remove["message"])
+            self._last_rendered.pop((channel.id, to_remove["message"]), None)
             await ctx.tick()
 
     @commands.group()
@@ -173,15 +322,18 @@ class Mcsvr(commands.Cog):
         """
         Sets the server tracker mode for the guild.
 
-        Valid values for the mode param are `text` or `embed`.
-        If set to embed, multiple servers can be tracked in one channel.
+        Valid values for the mode param are `text`, `embed` or `dashboard`.
+        If set to embed, multiple servers can be tracked in one channel,
+        each with its own message.
+        If set to dashboard, multiple servers can be tracked in one channel
+        and are all shown in one message (more if there are a lot of them).
         If set to text, only one server is allowed per channel because
         the channel topic will be used for the display.
         """
-        if mode not in ("text", "embed"):
+        if mode not in TRACKER_MODES:
             await ctx.send(
-                _("Invalid value for `{}`. Valid values are `{}`, `{}`").format(
-                    "mode", "text", "embed"
+                _("Invalid value for `{}`. Valid values are {}").format(
+                    "mode", ", ".join("`{}`".format(m) for m in TRACKER_MODES)
                 )
             )
             return
@@ -195,109 +347,564 @@ class Mcsvr(commands.Cog):
                     ).format("`{}mcset mode {} yes`".format(ctx.prefix, mode))
                 )
                 return
-            await self.do_mode_toggle_cleanup(current_mode, ctx.guild)
+            await self._tracker_ready.wait()
+            status_msg = await ctx.send(_("Removing currently tracked servers..."))
+            last_update = time.monotonic()
+
+            async def progress(done: int, total: int):
+                nonlocal last_update
+                # Edits are throttled so big guilds don't spend the rate limit on progress
+                if done < total and time.monotonic() - last_update < PROGRESS_INTERVAL:
+                    return
+                last_update = time.monotonic()
+                await status_msg.edit(
+                    content=_("Removing currently tracked servers... {}/{} channels").format(
+                        done, total
+                    )
+                )
+
+            await self.do_mode_toggle_cleanup(current_mode, ctx.guild, progress)
             await self.config.guild(ctx.guild).tracker_mode.set(mode)
+            self._tracker.set_mode(ctx.guild.id, mode)
             await ctx.tick()
         else:
             await ctx.send(_("I was already in mode `{}`").format(mode))
+
+    @mcset.command(name="interval")
+    async def mcset_interval(self, ctx: commands.Context, seconds: int):
+        """
+        Sets the minimum time between checks of this server's tracked servers.
+
+        Servers whose player count changes often are checked more often,
+        but never more often than this. Must be between 30 and 3600.
+
+        Channel topics can only be edited a couple of times every ten
+        minutes, so text mode displays are never updated more often than
+        every 300 seconds, and that's the minimum in text mode.
+        """
+        if seconds < 30 or seconds > 3600:
+            await ctx.send(_("The interval must be between 30 and 3600 seconds"))
+            return
+        await self._tracker_ready.wait()
+        if self._tracker.mode(ctx.guild.id) == "text" and seconds < TOPIC_INTERVAL:
+            await ctx.send(
+                _("In text mode the interval must be at least {} seconds").format(TOPIC_INTERVAL)
+            )
+            return
+        await self.config.guild(ctx.guild).poll_interval.set(seconds)
+        self._tracker.set_poll_interval(ctx.guild.id, seconds)
+        await ctx.tick()
+
+    @mcset.command(name="timeout")
+    @checks.is_owner()
+    async def mcset_timeout(self, ctx: commands.Context, connect: float, read: float = None):
+        """
+        Sets how long server checks wait for a server, in seconds.
+
+        `connect` is how long to wait to connect to a Java server and
+        `read` is how long to then wait for its status, or for a Bedrock
+        server to reply. If `read` isn't given, it's set the same as
+        `connect`. Both must be between 0.5 and 30.
+        """
+        if read is None:
+            read = connect
+        if not (MIN_TIMEOUT <= connect <= MAX_TIMEOUT and MIN_TIMEOUT <= read <= MAX_TIMEOUT):
+            await ctx.send(
+                _("Timeouts must be between {} and {} seconds").format(MIN_TIMEOUT, MAX_TIMEOUT)
+            )
+            return
+        await self.config.connect_timeout.set(connect)
+        await self.config.read_timeout.set(read)
+        self._connect_timeout = connect
+        self._read_timeout = read
+        await ctx.tick()
+
+    @mcset.command(name="stats")
+    @checks.is_owner()
+    async def mcset_stats(self, ctx: commands.Context):
+        """
+        Show status cache statistics
+        """
+        cache = self._svr_cache
+        dns_cache = self._resolver.cache
+        await ctx.send(
+            _(
+                "Cached statuses: {}/{}\n"
+                "Hits: {} Misses: {} (hit rate {:.1%})\n"
+                "Evictions: {}\n"
+                "Cached DNS records: {}/{} (hit rate {:.1%})\n"
+                "Tracker edits made: {} Skipped as unchanged: {}\n"
+                "Tracked servers: {} ({} backing off after failed checks)\n"
+                "Servers not being checked after repeated failures: {} "
+                "(checks skipped: {})\n"
+                "Timeouts: {}s to connect, {}s to read"
+            ).format(
+                len(cache),
+                cache.maxsize,
+                cache.hits,
+                cache.misses,
+                cache.hit_rate,
+                cache.evictions,
+                len(dns_cache),
+                dns_cache.maxsize,
+                dns_cache.hit_rate,
+                self._edits_made,
+                self._edits_skipped,
+                len(self._scheduler),
+                self._scheduler.backed_off(),
+                self._breaker.open_count(time.monotonic()),
+                self._breaker.skipped,
+                self._connect_timeout,
+                self._read_timeout,
+            )
+        )
     
-    async def check_server(self, addr: str) -> Union[PingResponse, str, None]:
-        """server = MinecraftServer.lookup(addr)
+    async def check_server(
+        self, addr: str, edition: str = None
+    ) -> Union[ServerSnapshot, str, Exception]:
+        """
+        Check the status of the server at the address.
+
+        If a check of the same address is already in progress, this waits
+        for that one instead of opening another connection to the server.
+        A server that has failed several checks in a row isn't checked
+        again for a while; ``CircuitOpen`` is returned instead.
+        """
+        key = (addr, edition)
+        skipped = self._breaker.check(key, addr, time.monotonic())
+        if skipped is not None:
+            return skipped
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._check_server(addr, edition))
+            self._inflight[key] = task
+            task.add_done_callback(partial(self._inflight_done, key))
+        # shielded so one caller giving up doesn't cancel the check for the rest
+        return await asyncio.shield(task)
 
+    def _inflight_done(self, key: Tuple[str, Optional[str]], task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def _check_server(self, addr: str, edition: str = None):
+        status = await self._check_editions(addr, edition)
+        failed = isinstance(status, (str, Exception))
+        self._breaker.record((addr, edition), not failed, time.monotonic())
+        return status
+
+    async def _check_editions(self, addr: str, edition: str = None):
+        if edition is not None:
+            status = await self.check_edition(addr, edition)
+            if not isinstance(status, (str, Exception)):
+                self._editions.set(addr, edition)
+            return status
+        known_edition = self._editions.get(addr)
+        if known_edition is not None:
+            status = await self.check_edition(addr, known_edition)
+            if not isinstance(status, (str, Exception)):
+                return status
+            # The server may have changed editions, so try both again
+            self._editions.pop(addr)
+        return await self.race_editions(addr)
+
+    async def race_editions(self, addr: str):
+        """
+        Check for a Java and a Bedrock server at the address at the same time.
+
+        The first edition to respond wins and is remembered for the address.
+        """
+        tasks = {asyncio.ensure_future(self.check_edition(addr, e)): e for e in EDITIONS}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    status = task.result()
+                    if not isinstance(status, (str, Exception)):
+                        self._editions.set(addr, tasks[task])
+                        return status
+        finally:
+            for task in pending:
+                task.cancel()
+        return "Could not get the status of a Java or Bedrock server at that address."
+
+    async def check_edition(self, addr: str, edition: str):
         try:
-            status = await server.async_status()
+            host, port = await self._resolver.lookup(addr, edition)
+            if edition == "java":
+                # mcstatus has one timeout, used for connecting and for each read, so the
+                # exchange as a whole is what gets limited by the read timeout
+                server = JavaServer(host, port, timeout=self._connect_timeout)
+                resp = await asyncio.wait_for(
+                    server.async_status(tries=1), self._connect_timeout + self._read_timeout
+                )
+                return ServerSnapshot.from_response(addr, resp)
+            # Bedrock pings all go through one shared socket
+            info, _ = await self._udp.bedrock_ping((host, port), self._read_timeout)
+            return ServerSnapshot.from_bedrock_pong(addr, info)
+        except asyncio.TimeoutError:
+            return "Timed out checking for a {} server at that address.".format(edition.title())
         except Exception as e:
             return e
-        return status
+
+    async def query_players(self, svr: ServerSnapshot, edition: str = None) -> ServerSnapshot:
         """
-        server = JavaServer.lookup(addr)
-        try:
-            status = await server.async_status()
-        except (asyncio.TimeoutError, ConnectionRefusedError):  # Status check timed out, so check if Bedrock works
-            server = BedrockServer.lookup(addr)
+        Fill in the player list of a Java server that hides it from status pings.
+
+        This uses the query protocol, which only works if the server has
+        enable-query on (on the same port as the game). If that fails the
+        snapshot is returned unchanged. Queries are cached per address,
+        failed ones included, so a server without enable-query isn't
+        waited on for every status. A successful result replaces the
+        cached status.
+        """
+        query = self._queries.get(svr.address)
+        if query is None:
             try:
-                status = await server.async_status()
-            except asyncio.TimeoutError:  # Status check also failed for Bedrock, is the server valid
-                return "Could not get the status of a Java or Bedrock server at that address."
-            except Exception as e:
-                return e
+                host, port = await self._resolver.lookup(svr.address, "java")
+                ip = await self._resolver.resolve_host(host)
+                query = await self._udp.query((ip, port), 1)
+            except (asyncio.TimeoutError, OSError, ValueError):
+                self._queries.set(svr.address, NO_QUERY, failed=True)
+                return svr
+            self._queries.set(svr.address, query)
+        if query is NO_QUERY:
+            return svr
+        svr = svr.with_players(query.players)
+        self._svr_cache.set((svr.address, edition), svr)
+        return svr
+
+    async def get_status(
+        self, server_ip: str, edition: str = None, refresh: bool = False
+    ) -> Union[ServerSnapshot, str, Exception]:
+        """
+        Get the status of a server, checking it only if it isn't cached.
+
+        Failed checks are cached too (for a shorter time), so the
+        returned value may be an error message or exception.
+        ``refresh`` skips the cache lookup but still stores the result.
+        """
+        key = (server_ip, edition)
+        svr = None if refresh else self._svr_cache.get(key)
+        if svr is None:
+            svr = await self.check_server(server_ip, edition)
+            self._svr_cache.set(key, svr, failed=isinstance(svr, (str, Exception)))
+        return svr
+
+    async def do_mode_toggle_cleanup(
+        self,
+        mode: str,
+        guild: discord.Guild,
+        progress: Callable[[int, int], Awaitable[None]] = None,
+    ) -> int:
+        """
+        Remove every tracker display of the given mode in the guild.
+
+        Channels are cleaned up concurrently and messages that were
+        already deleted are skipped. ``progress`` is awaited with the
+        number of channels done and the total as each one finishes.
+        Returns the number of channels that were cleaned up.
+        """
+        all_channels = await self.config.all_channels()
+        to_clean = []
+        for channel in guild.text_channels:
+            data = all_channels.get(channel.id)
+            if data is None:
+                continue
+            if mode == "text":
+                if data["server_ip"]:
+                    to_clean.append((channel, data))
+            elif mode == "dashboard":
+                if data["dashboard_servers"] or data["dashboard_messages"]:
+                    to_clean.append((channel, data))
+            elif data["servers"]:
+                to_clean.append((channel, data))
+        done = 0
+
+        async def cleanup(channel: discord.TextChannel, data: dict):
+            nonlocal done
+            if mode == "text":
+                message_ids = []
+            elif mode == "dashboard":
+                message_ids = data["dashboard_messages"]
             else:
-                return status
-        except Exception as e:
-            return e
-        else:
-            return status
+                message_ids = [server["message"] for server in data["servers"]]
+            try:
+                if mode == "text":
+                    await channel.edit(topic=data["original_topic"])
+                for message_id in message_ids:
+                    try:
+                        await channel.get_partial_message(message_id).delete()
+                    except discord.NotFound:
+                        pass
+            except discord.HTTPException:
+                log.exception("Failed cleaning up the tracker in {}".format(channel.id))
+            await self.config.channel(channel).clear()
+            self._tracker.remove_channel(channel.id)
+            self._last_rendered.pop((channel.id, None), None)
+            for message_id in message_ids:
+                self._last_rendered.pop((channel.id, message_id), None)
+            done += 1
+            if progress is not None:
+                await progress(done, len(to_clean))
+
+        await self.run_bounded(
+            [cleanup(channel, data) for channel, data in to_clean], limit=CLEANUP_CONCURRENCY
+        )
+        return len(to_clean)
+
+    async def load_timeouts(self):
+        self._connect_timeout = await self.config.connect_timeout()
+        self._read_timeout = await self.config.read_timeout()
+
+    async def load_tracker_index(self):
+        self._tracker = TrackerIndex.from_config(
+            await self.config.all_guilds(), await self.config.all_channels()
+        )
+        self._tracker_ready.set()
+        log.debug("Loaded {} tracker displays".format(len(self._tracker)))
+
+    def get_tracked_servers(
+        self,
+    ) -> Dict[ServerKey, List[Tuple[discord.TextChannel, Optional[int]]]]:
+        """
+        Build a mapping of (server address, edition) to every display tracking it.
+
+        Each display is a ``(channel, message_id)`` pair, where ``message_id``
+        is ``None`` for text mode (the channel topic is the display) and
+        ``DASHBOARD`` for a channel's dashboard. Displays that don't match
+        their guild's current mode are left out.
+        """
+        tracked = {}
+        for server, displays in self._tracker.servers():
+            for channel_id, message_id in displays:
+                channel = self.bot.get_channel(channel_id)
+                if channel is None:
+                    continue
+                mode = self._tracker.mode(channel.guild.id)
+                if message_id is None:
+                    if mode != "text":
+                        continue
+                    if not channel.permissions_for(channel.guild.me).manage_channels:
+                        continue
+                elif message_id == DASHBOARD:
+                    if mode != "dashboard":
+                        continue
+                elif mode != "embed":
+                    continue
+                tracked.setdefault(server, []).append((channel, message_id))
+        return tracked
+
+    async def probe_servers(self, servers: Iterable[ServerKey]) -> Dict[ServerKey, Any]:
+        """
+        Check each of the given (address, edition) pairs once, concurrently.
 
-    def server_ip_in_cache(self, server_ip: str, time: float):
-        if server_ip not in self._svr_cache:
+        At most ``PROBE_CONCURRENCY`` checks are in progress at a time.
+        The result for a server whose check failed is the error.
+        """
+        results = {}
+
+        async def probe(key):
+            results[key] = await self.get_status(*key, refresh=True)
+
+        await self.run_bounded([probe(key) for key in servers])
+        return results
+
+    async def update_tracked_display(
+        self,
+        channel: discord.TextChannel,
+        message_id: Optional[int],
+        svr: Union[ServerSnapshot, CircuitOpen],
+        checked_at: float = None,
+    ) -> bool:
+        """
+        Update a tracker display if what it shows has changed.
+
+        ``CircuitOpen`` shows the server as offline, with when it was last seen.
+        ``checked_at`` is when the server was checked (monotonic), which topic
+        edits are rate limited by. Returns whether an edit was made.
+        """
+        if checked_at is None:
+            checked_at = time.monotonic()
+        offline = isinstance(svr, CircuitOpen)
+        if message_id is None:
+            topic = get_server_string(None, svr.address, svr.last_seen) if offline else svr.text()
+            fingerprint = hash(topic)
+        elif offline:
+            embed = get_server_embed(None, svr.address, svr.last_seen)
+            fingerprint = embed_fingerprint(embed)
+        else:
+            embed = svr.embed()
+            fingerprint = svr.fingerprint()
+        key = (channel.id, message_id)
+        if self._last_rendered.get(key) == fingerprint:
+            self._edits_skipped += 1
+            return False
+        if message_id is None and not self.can_edit_topic(channel.id, checked_at):
+            # Editing now would be rate limited, and waiting that out would hold up
+            # every other update; the next check of the server tries again
             return False
-        server = self._svr_cache[server_ip]
-        if server["invalid_at"] <= time:
-            del self._svr_cache[server_ip]
+        try:
+            if message_id is None:
+                self.topic_edited(channel.id, checked_at)
+                await channel.edit(topic=topic)
+            else:
+                await channel.get_partial_message(message_id).edit(embed=embed)
+        except discord.NotFound:
+            if message_id is not None:
+                await self.prune_display(channel, message_id)
             return False
+        except discord.HTTPException:
+            log.exception(
+                "Failed updating the display for {} in {}".format(svr.address, channel.id)
+            )
+            return False
+        self._last_rendered[key] = fingerprint
+        self._edits_made += 1
         return True
 
-    async def do_mode_toggle_cleanup(self, mode, guild: discord.Guild):
-        if mode == "text":
-            for channel in guild.text_channels:
-                current_server = await self.config.channel(channel).server_ip()
-                if current_server:
-                    topic = await self.config.channel(channel).original_topic()
-                    await channel.edit(topic=topic)
-                    await self.config.channel(channel).server_ip.set("")
-                    await self.config.channel(channel).original_topic.set("")
-        else:
-            for channel in guild.text_channels:
-                servers = await self.config.channel(channel).servers()
-                for server in servers:
-                    msg = await channel.fetch_message(server["message"])
-                    await msg.delete()
-                await self.config.channel(channel).servers.set([])
+    def can_edit_topic(self, channel_id: int, now: float) -> bool:
+        """Get whether the channel's topic can be edited without hitting Discord's limit."""
+        edits = self._topic_edits.get(channel_id)
+        return edits is None or len(edits) < TOPIC_EDITS or now - edits[0] >= TOPIC_EDIT_WINDOW
 
-    async def server_check_loop(self):
-        check_time = 300
-        while self == self.bot.get_cog("Mcsvr"):
-            log.debug("Starting server checks")
-            all_channels = await self.config.all_channels()
-            for channel_id, info in all_channels.items():
-                now = datetime.now(tz.utc).timestamp()
-                channel = self.bot.get_channel(channel_id)
-                cur_mode = await self.config.guild(channel.guild).tracker_mode()
-                if channel is None or (
-                    cur_mode == "text"
-                    and not channel.permissions_for(channel.guild.me).manage_channels
-                ):
-                    continue
+    def topic_edited(self, channel_id: int, when: float):
+        edits = self._topic_edits.setdefault(channel_id, deque(maxlen=TOPIC_EDITS))
+        edits.append(when)
 
-                if cur_mode == "text":
-                    server_ip = info["server_ip"]
-                    if not server_ip:
+    async def render_dashboard(self, channel: discord.TextChannel) -> bool:
+        """
+        Render all of a channel's dashboard servers into its dashboard messages.
+
+        Messages are sent or deleted as needed to match the number of pages
+        and only pages whose content changed are edited. Returns whether
+        anything was edited.
+        """
+        servers = self._tracker.dashboards.get(channel.id, [])
+        embeds = get_dashboard_embeds([(key[0], self._latest.get(key)) for key in servers])
+        old_ids = self._tracker.dashboard_messages.get(channel.id, [])
+        message_ids = []
+        edited = False
+        try:
+            for page, embed in enumerate(embeds):
+                fingerprint = embed_fingerprint(embed)
+                message_id = old_ids[page] if page < len(old_ids) else None
+                if message_id is not None:
+                    if self._last_rendered.get((channel.id, message_id)) == fingerprint:
+                        self._edits_skipped += 1
+                        message_ids.append(message_id)
                         continue
-                    if not self.server_ip_in_cache(server_ip, now):
-                        svr = await self.check_server(server_ip)
-                        if isinstance(svr, (str, Exception)):
-                            continue
-                        self._svr_cache[server_ip] = {"resp": svr, "invalid_at": now + 180}
-                    else:
-                        svr = self._svr_cache[server_ip]["resp"]
-                    resp = get_server_string(svr, server_ip)
-                    await channel.edit(topic=resp)
-                else:
-                    for server in info["servers"]:
-                        server_ip = server["server_ip"]
-                        message = await channel.fetch_message(server["message"])
-                        if message is None:
-                            continue
-                        if not self.server_ip_in_cache(server_ip, now):
-                            svr = await self.check_server(server_ip)
-                            if isinstance(svr, (str, Exception)):
-                                continue
-                            self._svr_cache[server_ip] = {"resp": svr, "invalid_at": now + 180}
-                        else:
-                            svr = self._svr_cache[server_ip]["resp"]
-                        await message.edit(embed=get_server_embed(svr, server_ip))
-
-            now = datetime.now(tz.utc)
-            next_check = datetime.fromtimestamp(now.timestamp() + check_time, tz.utc)
-            log.debug("Done. Next check at {}".format(next_check.strftime("%Y-%m-%d %H:%M:%S")))
-            await asyncio.sleep(check_time)
+                    try:
+                        await channel.get_partial_message(message_id).edit(embed=embed)
+                    except discord.NotFound:
+                        message_id = None
+                if message_id is None:
+                    message_id = (await channel.send(embed=embed)).id
+                self._last_rendered[channel.id, message_id] = fingerprint
+                self._edits_made += 1
+                edited = True
+                message_ids.append(message_id)
+            for message_id in old_ids[len(embeds) :]:
+                self._last_rendered.pop((channel.id, message_id), None)
+                try:
+                    await channel.get_partial_message(message_id).delete()
+                except discord.NotFound:
+                    pass
+        except discord.HTTPException:
+            log.exception("Failed updating the dashboard in {}".format(channel.id))
+            message_ids.extend(old_ids[len(message_ids) :])
+        if message_ids != old_ids:
+            if message_ids:
+                self._tracker.dashboard_messages[channel.id] = message_ids
+            else:
+                self._tracker.dashboard_messages.pop(channel.id, None)
+            await self.config.channel(channel).dashboard_messages.set(message_ids)
+        return edited
+
+    async def prune_display(self, channel: discord.TextChannel, message_id: int):
+        """Stop tracking a display whose message was deleted."""
+        log.debug(
+            "Message {} in {} is gone, removing it from the tracker".format(message_id, channel.id)
+        )
+        async with self.config.channel(channel).servers() as servers:
+            servers[:] = [s for s in servers if s["message"] != message_id]
+        self._tracker.remove(channel.id, message_id)
+        self._last_rendered.pop((channel.id, message_id), None)
+
+    @staticmethod
+    async def run_bounded(coros: List[Awaitable], limit: int = PROBE_CONCURRENCY):
+        """Run the coroutines concurrently with at most ``limit`` running at once."""
+        sem = asyncio.Semaphore(limit)
+
+        async def run(coro):
+            async with sem:
+                return await coro
+
+        return await asyncio.gather(*(run(c) for c in coros))
+
+    async def check_due_servers(
+        self,
+        due: List[ServerKey],
+        tracked: Dict[ServerKey, List[Tuple[discord.TextChannel, Optional[int]]]],
+    ):
+        started = time.monotonic()
+        results = await self.probe_servers(due)
+        updates = []
+        dashboards = {}
+        for key, svr in results.items():
+            displays = tracked[key]
+            # Servers can be checked up to POLL_SLACK early, so topics get that much
+            # extra to keep their checks at least TOPIC_INTERVAL apart
+            floor = min(
+                self._tracker.display_interval(channel.guild.id, message_id)
+                + (POLL_SLACK if message_id is None else 0)
+                for channel, message_id in displays
+            )
+            failed = isinstance(svr, (str, Exception))
+            online = None if failed else svr.online
+            now = time.monotonic()
+            self._scheduler.record(key, online, now, floor)
+            if failed and not isinstance(svr, CircuitOpen):
+                # Show the server as offline as soon as its circuit opens
+                svr = self._breaker.error(key, key[0], now) or svr
+            self._latest[key] = svr
+            if not failed:
+                self._history.setdefault(key[0], PlayerHistory()).add(time.time(), online)
+            for channel, message_id in displays:
+                if message_id == DASHBOARD:
+                    # Rendered once per channel below, however many of its servers were checked
+                    dashboards[channel.id] = channel
+                elif not failed or isinstance(svr, CircuitOpen):
+                    updates.append(self.update_tracked_display(channel, message_id, svr, now))
+        updates.extend(self.render_dashboard(channel) for channel in dashboards.values())
+        edited = await self.run_bounded(updates)
+        log.debug(
+            "Checked {} servers in {:.2f}s, edited {} of {} displays".format(
+                len(due), time.monotonic() - started, sum(edited), len(edited)
+            )
+        )
+
+    async def server_check_loop(self):
+        await self.load_timeouts()
+        await self.load_tracker_index()
+        while self == self.bot.get_cog("Mcsvr"):
+            tracked = self.get_tracked_servers()
+            self._scheduler.sync(tracked.keys(), time.monotonic())
+            for key in [k for k in self._latest if k not in tracked]:
+                del self._latest[key]
+            tracked_ips = {server_ip for server_ip, _ in tracked}
+            for server_ip in [ip for ip in self._history if ip not in tracked_ips]:
+                del self._history[server_ip]
+            due = self._scheduler.pop_due(time.monotonic() + POLL_SLACK)
+            if due:
+                try:
+                    await self.check_due_servers(due, tracked)
+                except Exception:
+                    # The servers are rescheduled by sync() on the next pass
+                    log.exception("Failed checking {} tracked servers".format(len(due)))
+            next_due = self._scheduler.next_due()
+            if next_due is None:
+                delay = MAX_POLL_SLEEP
+            else:
+                delay = min(max(next_due - time.monotonic(), POLL_SLACK), MAX_POLL_SLEEP)
+            await asyncio.sleep(delay)
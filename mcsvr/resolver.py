@@ -0,0 +1,110 @@
+import ipaddress
+import logging
+from typing import Optional, Tuple
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+from .cache import StatusCache
+
+log = logging.getLogger("red.mcsvr")
+
+DEFAULT_PORTS = {"java": 25565, "bedrock": 19132}
+
+NO_RECORD = ()  # cached in place of an answer when the name has no such record
+
+
+class Resolver:
+    """
+    Resolves server addresses without blocking the event loop.
+
+    SRV and A lookups are cached for as long as their DNS TTL says
+    (clamped to ``min_ttl``-``max_ttl``), and names without a record
+    are cached for ``negative_ttl``.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 2048,
+        min_ttl: float = 30,
+        max_ttl: float = 3600,
+        negative_ttl: float = 300,
+        timeout: float = 3,
+    ):
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.timeout = timeout
+        self.cache = StatusCache(maxsize=maxsize, negative_ttl=negative_ttl)
+        self._resolver = dns.asyncresolver.Resolver()
+
+    async def lookup(self, addr: str, edition: str) -> Tuple[str, int]:
+        """
+        Get the host and port to connect to for a server address.
+
+        Java servers without an explicit port are looked up through their
+        ``_minecraft._tcp`` SRV record. The host is kept as a name for Java
+        since it is sent to the server in the handshake (proxies use it to
+        pick a backend), while Bedrock hosts are resolved to an IP
+        (``ValueError`` is raised if they can't be).
+        """
+        host, _, port = addr.partition(":")
+        port = int(port) if port else None
+        if edition == "java":
+            if port is None:
+                srv = await self.resolve_srv(host)
+                if srv is not None:
+                    return srv
+            return host, port or DEFAULT_PORTS["java"]
+        return await self.resolve_host(host), port or DEFAULT_PORTS[edition]
+
+    async def resolve_srv(self, host: str) -> Optional[Tuple[str, int]]:
+        """Get the target host and port of the host's Minecraft SRV record, if it has one."""
+        if _is_ip(host):
+            return None
+        answer = await self._resolve("_minecraft._tcp.{}".format(host), "SRV")
+        if answer is None:
+            return None
+        record = min(answer, key=lambda r: (r.priority, -r.weight))
+        return str(record.target).rstrip("."), record.port
+
+    async def resolve_host(self, host: str) -> str:
+        """
+        Get an IP for the host.
+
+        Raises ``ValueError`` if it can't be resolved, rather than leaving
+        the socket to resolve it (which would block the event loop).
+        """
+        if _is_ip(host):
+            return host
+        answer = await self._resolve(host, "A")
+        if answer is None:
+            raise ValueError("Could not resolve {}".format(host))
+        return answer[0].address
+
+    async def _resolve(self, qname: str, rdtype: str):
+        key = (qname, rdtype)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached or None
+        try:
+            answer = await self._resolver.resolve(qname, rdtype, lifetime=self.timeout)
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            self.cache.set(key, NO_RECORD, failed=True)
+            return None
+        except dns.exception.DNSException as e:
+            # Timeouts and server failures are not cached, the next lookup retries
+            log.debug("Failed resolving {} {}: {}".format(rdtype, qname, e))
+            return None
+        records = list(answer)
+        ttl = min(max(answer.rrset.ttl, self.min_ttl), self.max_ttl)
+        self.cache.set(key, records, ttl=ttl)
+        return records
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,112 @@
+import heapq
+import itertools
+from typing import Dict, Iterable, List, Optional
+
+from .tracker import ServerKey
+
+
+class PollState:
+    __slots__ = ("interval", "failures", "online")
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.failures = 0
+        self.online = None
+
+
+class PollScheduler:
+    """
+    Decides when each tracked server is checked next.
+
+    Servers are kept in a heap ordered by when they are next due. After
+    each check the server's interval is adjusted:
+
+    * failed checks back off exponentially, up to ``max_interval``
+    * a changed player count halves the interval, down to the floor given
+      for the server (the smallest minimum interval of the guilds tracking it)
+    * an unchanged player count lets the interval drift back up to
+      ``base_interval``
+    """
+
+    def __init__(self, base_interval: float = 300, max_interval: float = 3600):
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self._heap = []  # (due, seq, server); stale entries are skipped when popped
+        self._due: Dict[ServerKey, float] = {}
+        self._state: Dict[ServerKey, PollState] = {}
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._due)
+
+    def schedule(self, server: ServerKey, due: float):
+        self._due[server] = due
+        heapq.heappush(self._heap, (due, next(self._seq), server))
+        if server not in self._state:
+            self._state[server] = PollState(self.base_interval)
+
+    def discard(self, server: ServerKey):
+        self._due.pop(server, None)
+        self._state.pop(server, None)
+
+    def sync(self, servers: Iterable[ServerKey], now: float):
+        """Make the scheduled servers match ``servers``, new ones being due now."""
+        servers = set(servers)
+        for server in [s for s in self._due if s not in servers]:
+            self.discard(server)
+        for server in servers:
+            if server not in self._due:
+                self.schedule(server, now)
+        if len(self._heap) > 2 * len(self._due) + 64:
+            # Too many stale entries from rescheduling, so rebuild the heap
+            self._heap = [(due, next(self._seq), server) for server, due in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        while self._heap:
+            due, _, server = self._heap[0]
+            if self._due.get(server) == due:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: float) -> List[ServerKey]:
+        """Remove and return every server due at or before ``now``."""
+        servers = []
+        while self._heap and self._heap[0][0] <= now:
+            due, _, server = heapq.heappop(self._heap)
+            if self._due.get(server) == due:
+                del self._due[server]
+                servers.append(server)
+        return servers
+
+    def record(self, server: ServerKey, online: Optional[int], now: float, floor: float) -> float:
+        """
+        Record the result of checking a server and schedule its next check.
+
+        ``online`` is the player count, or ``None`` if the check failed.
+        Returns the server's new interval.
+        """
+        state = self._state.get(server)
+        if state is None:
+            state = self._state[server] = PollState(self.base_interval)
+        if online is None:
+            state.failures += 1
+            backoff = self.base_interval * 2 ** min(state.failures, 16)
+            state.interval = min(backoff, self.max_interval)
+        else:
+            if state.failures:
+                state.interval = self.base_interval
+            elif state.online is not None and online != state.online:
+                state.interval = state.interval / 2
+            else:
+                state.interval = min(state.interval * 1.5, self.base_interval)
+            state.failures = 0
+            state.online = online
+        state.interval = max(state.interval, floor)
+        self.schedule(server, now + state.interval)
+        return state.interval
+
+    def backed_off(self) -> int:
+        """Get the number of servers currently backing off after failed checks."""
+        return sum(1 for state in self._state.values() if state.failures)
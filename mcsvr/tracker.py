@@ -0,0 +1,136 @@
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# (server address, edition or None)
+ServerKey = Tuple[str, Optional[str]]
+# (channel id, message id), where the message id is None when the channel topic is the display
+DisplayKey = Tuple[int, Optional[int]]
+
+# Stands in for the message id in the DisplayKey of a channel's dashboard
+DASHBOARD = 0
+
+DEFAULT_POLL_INTERVAL = 60
+# Discord allows this many topic edits per channel in each window of this many seconds
+TOPIC_EDITS = 2
+TOPIC_EDIT_WINDOW = 600
+# Text mode displays are never checked more often than this, so they stay within that limit
+TOPIC_INTERVAL = TOPIC_EDIT_WINDOW // TOPIC_EDITS
+
+
+class TrackerIndex:
+    """
+    In-memory index of everything the tracker displays.
+
+    This mirrors the tracker settings in Config so the tracker loop
+    never has to read Config. It is loaded once when the cog starts,
+    and the commands that change those settings keep it up to date.
+    """
+
+    def __init__(self):
+        self.guild_modes: Dict[int, str] = {}
+        self.guild_intervals: Dict[int, float] = {}
+        self.displays: Dict[DisplayKey, ServerKey] = {}
+        self.by_server: Dict[ServerKey, Set[DisplayKey]] = {}
+        self.by_channel: Dict[int, Set[DisplayKey]] = {}
+        self.dashboards: Dict[int, List[ServerKey]] = {}
+        self.dashboard_messages: Dict[int, List[int]] = {}
+
+    @classmethod
+    def from_config(cls, all_guilds: dict, all_channels: dict) -> "TrackerIndex":
+        """Build the index from ``Config.all_guilds()`` and ``Config.all_channels()``."""
+        index = cls()
+        for guild_id, data in all_guilds.items():
+            index.guild_modes[guild_id] = data["tracker_mode"]
+            index.guild_intervals[guild_id] = data["poll_interval"]
+        for channel_id, data in all_channels.items():
+            if data["server_ip"]:
+                index.add(channel_id, None, data["server_ip"], data["edition"] or None)
+            for server in data["servers"]:
+                edition = server.get("edition") or None
+                index.add(channel_id, server["message"], server["server_ip"], edition)
+            for server in data["dashboard_servers"]:
+                index.add_to_dashboard(channel_id, server["server_ip"], server["edition"] or None)
+            if data["dashboard_messages"]:
+                index.dashboard_messages[channel_id] = list(data["dashboard_messages"])
+        return index
+
+    def __len__(self):
+        """Get the number of displays, counting each channel's dashboard as one."""
+        return len(self.displays) + len(self.dashboards)
+
+    def mode(self, guild_id: int) -> str:
+        return self.guild_modes.get(guild_id, "text")
+
+    def set_mode(self, guild_id: int, mode: str):
+        self.guild_modes[guild_id] = mode
+
+    def poll_interval(self, guild_id: int) -> float:
+        """Get the minimum time between checks of the guild's tracked servers."""
+        return self.guild_intervals.get(guild_id, DEFAULT_POLL_INTERVAL)
+
+    def set_poll_interval(self, guild_id: int, interval: float):
+        self.guild_intervals[guild_id] = interval
+
+    def display_interval(self, guild_id: int, message_id: Optional[int]) -> float:
+        """Get the minimum time between updates of one of the guild's displays."""
+        interval = self.poll_interval(guild_id)
+        if message_id is None:
+            return max(interval, TOPIC_INTERVAL)
+        return interval
+
+    def add(self, channel_id: int, message_id: Optional[int], server_ip: str, edition: str = None):
+        display = (channel_id, message_id)
+        self.remove(channel_id, message_id)
+        self.displays[display] = (server_ip, edition)
+        self.by_server.setdefault((server_ip, edition), set()).add(display)
+        self.by_channel.setdefault(channel_id, set()).add(display)
+
+    def remove(self, channel_id: int, message_id: Optional[int]) -> Optional[ServerKey]:
+        """Remove a display, returning the server it was showing (if any)."""
+        display = (channel_id, message_id)
+        server = self.displays.pop(display, None)
+        if server is not None:
+            _discard(self.by_server, server, display)
+            _discard(self.by_channel, channel_id, display)
+        return server
+
+    def add_to_dashboard(self, channel_id: int, server_ip: str, edition: str = None):
+        server = (server_ip, edition)
+        servers = self.dashboards.setdefault(channel_id, [])
+        if server not in servers:
+            servers.append(server)
+        display = (channel_id, DASHBOARD)
+        self.by_server.setdefault(server, set()).add(display)
+        self.by_channel.setdefault(channel_id, set()).add(display)
+
+    def remove_from_dashboard(self, channel_id: int, server_ip: str) -> Optional[ServerKey]:
+        """Remove a server from a channel's dashboard, returning it if it was there."""
+        servers = self.dashboards.get(channel_id, [])
+        for server in servers:
+            if server[0] == server_ip:
+                break
+        else:
+            return None
+        servers.remove(server)
+        display = (channel_id, DASHBOARD)
+        _discard(self.by_server, server, display)
+        if not servers:
+            del self.dashboards[channel_id]
+            _discard(self.by_channel, channel_id, display)
+        return server
+
+    def remove_channel(self, channel_id: int):
+        for server_ip, _ in list(self.dashboards.get(channel_id, ())):
+            self.remove_from_dashboard(channel_id, server_ip)
+        self.dashboard_messages.pop(channel_id, None)
+        for display in list(self.by_channel.get(channel_id, ())):
+            self.remove(*display)
+
+    def servers(self) -> Iterator[Tuple[ServerKey, Set[DisplayKey]]]:
+        return iter(self.by_server.items())
+
+
+def _discard(mapping: dict, key, display: DisplayKey):
+    displays = mapping[key]
+    displays.discard(display)
+    if not displays:
+        del mapping[key]
@@ -0,0 +1,140 @@
+import asyncio
+import itertools
+import logging
+import struct
+import time
+from typing import Dict, List, Tuple
+
+log = logging.getLogger("red.mcsvr")
+
+RAKNET_MAGIC = bytes.fromhex("00ffff00fefefefefdfdfdfd12345678")
+CLIENT_GUID = struct.pack(">q", 0x2A2A2A2A2A2A2A2A)
+
+QUERY_MAGIC = b"\xfe\xfd"
+QUERY_HANDSHAKE = 0x09
+QUERY_STAT = 0x00
+
+Address = Tuple[str, int]
+
+
+class QueryResult:
+    """The parsed response to a full stat query."""
+
+    __slots__ = ("info", "players")
+
+    def __init__(self, info: Dict[str, str], players: List[str]):
+        self.info = info
+        self.players = players
+
+
+class DatagramProber(asyncio.DatagramProtocol):
+    """
+    One UDP socket shared by every Bedrock ping and Java query request.
+
+    Replies are matched to their request by the address they came from
+    plus a token: the timestamp field echoed back in a Bedrock pong, or
+    the session ID of a query. Addresses must be IPs, since replies come
+    back from an IP.
+    """
+
+    def __init__(self):
+        self._transport = None
+        self._start_lock = asyncio.Lock()
+        self._pending: Dict[Tuple[Address, int, bytes], asyncio.Future] = {}
+        self._tokens = itertools.count(1)
+
+    async def start(self):
+        async with self._start_lock:
+            if self._transport is None or self._transport.is_closing():
+                loop = asyncio.get_event_loop()
+                await loop.create_datagram_endpoint(lambda: self, local_addr=("0.0.0.0", 0))
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+        for fut in self._pending.values():
+            fut.cancel()
+        self._pending.clear()
+
+    def __len__(self):
+        return len(self._pending)
+
+    # DatagramProtocol callbacks
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def connection_lost(self, exc):
+        self._transport = None
+
+    def error_received(self, exc):
+        # ICMP errors on an unconnected socket don't say which request they're
+        # for, so the request they belong to will time out instead
+        log.debug("Error on the shared UDP socket: {}".format(exc))
+
+    def datagram_received(self, data: bytes, addr):
+        if not data:
+            return
+        kind = data[0]
+        if kind == 0x1C:  # unconnected pong, token is the echoed ping time
+            token = data[1:9]
+        elif kind in (QUERY_HANDSHAKE, QUERY_STAT):
+            token = data[1:5]
+        else:
+            return
+        fut = self._pending.get(((addr[0], addr[1]), kind, token))
+        if fut is not None and not fut.done():
+            fut.set_result(data)
+
+    # Requests
+
+    async def _request(
+        self, addr: Address, packet: bytes, kind: int, token: bytes, timeout: float
+    ) -> bytes:
+        await self.start()
+        key = (addr, kind, token)
+        fut = asyncio.get_event_loop().create_future()
+        self._pending[key] = fut
+        try:
+            self._transport.sendto(packet, addr)
+            return await asyncio.wait_for(fut, timeout)
+        finally:
+            self._pending.pop(key, None)
+
+    async def bedrock_ping(self, addr: Address, timeout: float = 3) -> Tuple[bytes, float]:
+        """
+        Send a RakNet unconnected ping, returning the pong's server info and the latency.
+
+        The server info is the ``MCPE;motd;...`` string as bytes.
+        """
+        token = struct.pack(">q", next(self._tokens))
+        packet = b"\x01" + token + RAKNET_MAGIC + CLIENT_GUID
+        start = time.perf_counter()
+        data = await self._request(addr, packet, 0x1C, token, timeout)
+        latency = (time.perf_counter() - start) * 1000
+        # id(1) + time(8) + server guid(8) + magic(16), then a length-prefixed string
+        (length,) = struct.unpack(">H", data[33:35])
+        return data[35 : 35 + length], latency
+
+    async def query(self, addr: Address, timeout: float = 3) -> QueryResult:
+        """Do a GameSpy4 (UT3) full stat query, as used by Java servers with enable-query on."""
+        session = struct.pack(">i", next(self._tokens) & 0x0F0F0F0F)
+        handshake = QUERY_MAGIC + bytes((QUERY_HANDSHAKE,)) + session
+        data = await self._request(addr, handshake, QUERY_HANDSHAKE, session, timeout)
+        challenge = int(data[5:].split(b"\x00", 1)[0])
+        stat = QUERY_MAGIC + bytes((QUERY_STAT,)) + session + struct.pack(">i", challenge)
+        data = await self._request(addr, stat + b"\x00" * 4, QUERY_STAT, session, timeout)
+        return parse_full_stat(data)
+
+
+def parse_full_stat(data: bytes) -> QueryResult:
+    # type(1) + session(4) + "splitnum\0\x80\0"(11), then key\0value\0 pairs ending
+    # with an empty key, then "\x01player_\0\0" and names ending with an empty name
+    body = data[16:]
+    info_part, _, players_part = body.partition(b"\x00\x00\x01player_\x00\x00")
+    fields = info_part.split(b"\x00")
+    info = {}
+    for key, value in zip(fields[::2], fields[1::2]):
+        info[key.decode("utf-8", "replace")] = value.decode("utf-8", "replace")
+    players = [p.decode("utf-8", "replace") for p in players_part.split(b"\x00") if p]
+    return QueryResult(info, players)